@@ -0,0 +1,95 @@
+# Standard
+import argparse
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+import tempfile
+import time
+# External
+import numpy as np
+# Local
+from checkpoint import Checkpointer, load_checkpoint
+from definitions import stream
+from early_stopping import EarlyStopping
+from td_learning import SarlsaLamda
+
+
+def train(num_episodes: int, lamda: float, seed: int, resume: str=None,
+          checkpoint: Checkpointer=None) -> tuple:
+    """
+    Trains Sarsa(lamda) with seeded cards and early-stopping checks, from
+    scratch or resumed from the checkpoint at the resume path, writing checkpoints
+    if given.
+
+    Returns the learner and its checks.
+    """
+    TD = SarlsaLamda(lamda=lamda)
+    stopping = EarlyStopping(every=1000, tol=0.0) # Checked, but never settled
+    stream.seed(seed)
+    start_episode = TD.load_checkpoint(load_checkpoint(resume, mmap_mode='r'), stopping) if resume else 0
+    with redirect_stdout(io.StringIO()):
+        TD.run(num_episodes, num_iter=num_episodes, plot=False, checkpoint=checkpoint,
+               start_episode=start_episode, stopping=stopping)
+    return TD, stopping
+
+def check(num_episodes: int=20000, lamda: float=0.5, seed: int=0) -> dict:
+    """
+    Checks that a run checkpointed halfway and resumed in a new learner ends in the
+    same state as an uninterrupted run with the same seed.
+
+    The first half is written to a checkpoint in the background, as the script
+    does, and the resumed learner reads it through a memory map. Every array of
+    the final checkpoints of both runs (counts, Q, random stream, early-stopping
+    checks) must be equal. The traces are not checkpointed, since every episode
+    starts with empty ones.
+
+    Returns whether each array is equal.
+    """
+    full, full_stopping = train(num_episodes, lamda, seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint')
+        half = num_episodes // 2
+        train(half, lamda, seed, checkpoint=Checkpointer(path, half))
+        resumed, resumed_stopping = train(num_episodes, lamda, seed, resume=path)
+
+        expected = full.get_checkpoint(num_episodes, full_stopping)
+        actual = resumed.get_checkpoint(num_episodes, resumed_stopping)
+        return {key: key in actual and np.array_equal(np.asarray(value), np.asarray(actual[key]))
+                for key, value in expected.items()}
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Check that a resumed Sarsa(lamda) run ends like an uninterrupted one.')
+
+    parser.add_argument('--episodes',
+                        type=int,
+                        help='Number of episodes of both runs',
+                        default=20000)
+
+    parser.add_argument('--lamda',
+                        type=float,
+                        help='Eligibility trace decay rate',
+                        default=0.5)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the cards and exploration',
+                        default=0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    start_time = time.time()
+    results = check(args.episodes, args.lamda, args.seed)
+    print(f'Compared runs of {args.episodes} episodes in {time.time() - start_time:.2f} sec')
+    for key, equal in results.items():
+        print(f'{key:<14} {"equal" if equal else "MISMATCH"}')
+
+    if not all(results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Standard
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import io
+import sys
+import time
+# External
+import numpy as np
+# Local
+from batch_td_learning import BatchSarsaLamda
+from definitions import stream
+from td_learning import SarlsaLamda
+
+
+def run_config(config: dict) -> np.ndarray:
+    """Trains the online or the batched learner for a single configuration, in a worker process."""
+    with redirect_stdout(io.StringIO()):
+        if config['batched']:
+            TD = BatchSarsaLamda(lamda=config['lamda'], seed=config['seed'])
+            TD.run(config['episodes'], num_iter=config['episodes'], plot=False)
+        else:
+            stream.seed(config['seed'])
+            TD = SarlsaLamda(lamda=config['lamda'])
+            TD.run(config['episodes'], num_iter=config['episodes'], plot=False)
+    return TD.Qs.avfs.copy()
+
+def compare(lamdas: list, episodes: int=100000, tolerance: float=2.0,
+            max_workers: int=None, seed: int=0) -> dict:
+    """
+    Checks that the batched learner reproduces the online learner's Q surface for
+    every lamda.
+
+    Every lamda is trained online with two seeds and batched with a third. The MSE
+    between the two online surfaces is the seed noise of the surface; the batched
+    surface passes when its MSE to the first online surface stays within tolerance
+    times that noise.
+
+    Returns the MSEs, greedy-policy disagreements and verdicts per lamda.
+    """
+    seeds = [int(ss.generate_state(1)[0]) for ss in np.random.SeedSequence(seed).spawn(3 * len(lamdas))]
+    configs = [{'lamda': lamda, 'episodes': episodes, 'batched': run == 2, 'seed': seeds[3 * i + run]}
+               for i, lamda in enumerate(lamdas) for run in range(3)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        Qs = list(executor.map(run_config, configs))
+
+    results = {}
+    for i, lamda in enumerate(lamdas):
+        online, other, batched = Qs[3 * i:3 * i + 3]
+        noise = np.mean((other - online) ** 2)
+        mse = np.mean((batched - online) ** 2)
+        disagreement = np.mean((batched[..., 1] > batched[..., 0]) != (online[..., 1] > online[..., 0]))
+        results[lamda] = {'mse': mse, 'noise': noise, 'disagreement': disagreement,
+                          'ok': bool(mse <= tolerance * noise)}
+    return results
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Check that batched Sarsa(lamda) reproduces the online Q surfaces.')
+
+    parser.add_argument('--lamdas',
+                        type=float,
+                        nargs='+',
+                        help='Eligibility trace decay rates',
+                        default=[round(0.1 * i, 1) for i in range(11)])
+
+    parser.add_argument('--episodes',
+                        type=int,
+                        help='Number of episodes per run',
+                        default=100000)
+
+    parser.add_argument('--tolerance',
+                        type=float,
+                        help='Largest batched-to-online MSE, as a multiple of the online seed noise',
+                        default=2.0)
+
+    parser.add_argument('--workers',
+                        type=int,
+                        help='Number of worker processes (default: one per core)',
+                        default=None)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Base seed the per-run seeds are spawned from',
+                        default=0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    start_time = time.time()
+    results = compare(args.lamdas, args.episodes, args.tolerance, args.workers, args.seed)
+    print(f'Compared {len(results)} lamdas in {time.time() - start_time:.2f} sec')
+    print(f'{"lamda":>6} {"MSE to online":>14} {"online noise":>13} {"disagreement":>13}')
+    for lamda, r in results.items():
+        print(f'{lamda:>6.1f} {r["mse"]:>14.5f} {r["noise"]:>13.5f} {r["disagreement"]:>13.3f}  {"ok" if r["ok"] else "MISMATCH"}')
+
+    if not all(r['ok'] for r in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
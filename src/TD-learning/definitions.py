@@ -1,11 +1,76 @@
 # Standard
-from dataclasses import dataclass
 from enum import Enum
-import random
 # External
+import numpy as np
 # Local
 
-      
+
+class RandomStream():
+    """
+    Hands out pre-drawn random numbers from a seeded numpy Generator.
+
+    Cards are drawn as combined codes 0-29 (value = code % 10 + 1, red below 10, so
+    red has probability 1/3), and exploration as uniforms in [0, 1). Both are drawn
+    in large blocks and handed out through a cursor, refilling when a block runs out.
+    """
+    def __init__(self, seed: int=None, block: int=65536):
+        self.block = block
+        self.seed(seed)
+
+    def seed(self, seed: int=None):
+        """Restarts the stream from a seed."""
+        self.rng = np.random.default_rng(seed)
+        self.refill_cards()
+        self.refill_uniforms()
+
+    def refill_cards(self):
+        self.cards_state = self.rng.bit_generator.state
+        self.cards = self.rng.integers(0, 30, size=self.block).tolist()
+        self.card_idx = 0
+
+    def refill_uniforms(self):
+        self.uniforms_state = self.rng.bit_generator.state
+        self.uniforms = self.rng.random(self.block).tolist()
+        self.uniform_idx = 0
+
+    def get_state(self) -> dict:
+        """Returns the state of the stream: the generator states the current blocks
+        were drawn from, the cursors, and the current generator state."""
+        return {'rng': self.rng.bit_generator.state,
+                'cards_state': self.cards_state,
+                'card_idx': self.card_idx,
+                'uniforms_state': self.uniforms_state,
+                'uniform_idx': self.uniform_idx}
+
+    def set_state(self, state: dict):
+        """Restores the stream to a state from get_state, by redrawing its blocks."""
+        self.rng.bit_generator.state = state['cards_state']
+        self.refill_cards()
+        self.rng.bit_generator.state = state['uniforms_state']
+        self.refill_uniforms()
+        self.rng.bit_generator.state = state['rng']
+        self.card_idx = state['card_idx']
+        self.uniform_idx = state['uniform_idx']
+
+    def card(self) -> int:
+        """Returns the code of the next card."""
+        if self.card_idx == self.block:
+            self.refill_cards()
+        code = self.cards[self.card_idx]
+        self.card_idx += 1
+        return code
+
+    def uniform(self) -> float:
+        """Returns the next exploration uniform."""
+        if self.uniform_idx == self.block:
+            self.refill_uniforms()
+        u = self.uniforms[self.uniform_idx]
+        self.uniform_idx += 1
+        return u
+
+# Shared random stream of the game and the policies
+stream = RandomStream()
+
 class Card:
     """Represents a card in the deck"""
     value: int
@@ -19,39 +84,45 @@ class Card:
         # Custom representation for debugging
         return f"{self.color}{self.value}"
 
-@dataclass
+# Non-terminal states: dealer's first card 1-10 x player's sum 1-21
+NUM_STATES = 10 * 21
+# Id of the terminal state the player reaches by busting
+TERMINAL = NUM_STATES
+# Lowest sum the dealer sticks on, up to 21
+DEALER_STICK = 17
+
+def state_id(d_first: int, p_sum: int) -> int:
+    """Returns the integer id of a state, (d_first - 1) * 21 + (p_sum - 1),
+    or TERMINAL if the player's sum is outside 1-21."""
+    return (d_first - 1) * 21 + p_sum - 1 if 1 <= p_sum <= 21 else TERMINAL
+
 class State:
-    """Dealer’s first card 1–10 and the player’s sum 1–21"""
-    d_first_card: Card
-    p_sum: int
+    """Dealer’s first card 1–10 and the player’s sum 1–21, with their integer id"""
+    __slots__ = ('d_first', 'p_sum', 'id')
 
-    def __str__(self):
-        return f"{self.d_first_card}-{self.p_sum}"
+    def __init__(self, d_first: int, p_sum: int):
+        self.d_first = d_first
+        self.p_sum = p_sum
+        self.id = state_id(d_first, p_sum)
 
-    def to_tuple(self):
-        return (self.d_first_card, self.p_sum)
+    def __str__(self):
+        return f"b{self.d_first}-{self.p_sum}"
 
-    def to_key(self):
-        return (str(self.d_first_card), self.p_sum)
+    def __repr__(self):
+        return f"b{self.d_first}-{self.p_sum}"
     
 class Deck():
     def __init__(self):
         # List of card values
         self.cards_values = list(range(1, 11))
-        self.red_cards = [f"r{value}" for value in self.cards_values]
-        self.black_cards = [f"b{value}" for value in self.cards_values]
-        self.cards = self.red_cards + self.black_cards
-
-    @property
-    def all_cards(self):
-        # Return red and black cards into a single list
-        return self.cards
 
     @staticmethod
     def draw_card():
+        # One code gives both the value and the color
+        code = stream.card()
         card = Card()
-        card.value = Deck.get_value()
-        card.color = Deck.get_color()
+        card.value = code % 10 + 1
+        card.color = "r" if code < 10 else "b"
         return card
 
     @staticmethod
@@ -61,18 +132,19 @@ class Deck():
         card.color = "b"
         return card
 
+    @staticmethod
+    def card_distribution() -> dict:
+        """Returns the probability of every signed card value (negative for red) of a draw."""
+        # Values 1-10 are uniform, red: 1/3, black: 2/3
+        distribution = {-value: 1/3 * 1/10 for value in range(1, 11)}
+        distribution.update({value: 2/3 * 1/10 for value in range(1, 11)})
+        return distribution
+
     @staticmethod
     def get_value():
         # Each draw results in a value 1-10
-        card = random.randint(1, 10)
+        card = stream.card() % 10 + 1
         return card
-
-    @staticmethod
-    def get_color():
-        # Generate a random number between 0 and 1
-        color_prob = random.random()
-        # Assign color based on the probabilities red: 1/3, black: 2/3
-        return "r" if color_prob < 1/3 else "b"
         
 class Gambler():
     def __init__(self):
@@ -144,7 +216,7 @@ class Player(Gambler):
         elif a == 's':
             self.stick()
 
-        new_state = State(s.d_first_card, self.sum)
+        new_state = State(s.d_first, self.sum)
             
         return new_state
     
@@ -153,8 +225,14 @@ class Dealer(Gambler):
         super().__init__()
 
     def step(self):
-        # Stick if in [17, 21]
-        if self.sum >= 17 and self.sum <= 21:
+        # Stick if in [DEALER_STICK, 21]
+        if self.sum >= DEALER_STICK and self.sum <= 21:
             self.stick()
         else:
             self.hit()
+
+    def finish(self, d_sum: int):
+        """Jumps to a final sum (0 for a bust) without drawing the cards in between."""
+        self.sum = d_sum if d_sum else 22
+        if self.sum >= DEALER_STICK and self.sum <= 21:
+            self.stick()
@@ -0,0 +1,83 @@
+# Standard
+import argparse
+# External
+import numpy as np
+# Local
+
+
+class EarlyStopping():
+    """
+    Stops training once Q has settled.
+
+    Every few episodes, Q is compared to its previous snapshot: the largest change of
+    any value, and the number of states whose greedy action flipped. Training stops
+    once both stay within their thresholds for patience checks in a row.
+    """
+    def __init__(self, every: int=1000, tol: float=1e-3, max_flips: int=0, patience: int=5):
+        self.every = every # Checking period, in episodes
+        self.tol = tol # Largest change of a value that counts as settled
+        self.max_flips = max_flips # Most greedy-action flips that count as settled
+        self.patience = patience
+        self.prev = None
+        self.streak = 0
+        self.history = [] # (largest change, flips) of every check
+        self.stopped_at = None # Episode training stopped at, if it stopped early
+
+    def check(self, Q: np.ndarray) -> bool:
+        """Compares a snapshot of Q (10, 21, 2) to the previous one, and returns whether to stop."""
+        if self.prev is None:
+            self.prev = Q.copy()
+            return False
+
+        max_change = np.max(np.abs(Q - self.prev))
+        flips = np.count_nonzero((Q[..., 1] > Q[..., 0]) != (self.prev[..., 1] > self.prev[..., 0]))
+        self.history.append((max_change, flips))
+        self.prev[:] = Q
+
+        self.streak = self.streak + 1 if max_change <= self.tol and flips <= self.max_flips else 0
+        return self.streak >= self.patience
+
+    def get_checkpoint(self) -> dict:
+        """Returns the state of the checks, to resume them with a training checkpoint."""
+        state = {'stop_streak': self.streak,
+                 'stop_history': np.array(self.history, dtype=float).reshape(-1, 2)}
+        if self.prev is not None:
+            state['stop_prev'] = self.prev
+        return state
+
+    def load_checkpoint(self, data: dict):
+        """Restores the state of the checks from a training checkpoint, if it holds one."""
+        if 'stop_prev' in data:
+            self.prev = np.array(data['stop_prev'])
+        if 'stop_streak' in data:
+            self.streak = int(data['stop_streak'])
+            self.history = [(change, int(flips)) for change, flips in data['stop_history']]
+
+def add_stopping_arguments(parser: argparse.ArgumentParser):
+    """Adds the early-stopping options to a script's parser."""
+    parser.add_argument('--stop-every',
+                        type=int,
+                        help='Early-stopping check period, in episodes (0 disables early stopping)',
+                        default=0)
+
+    parser.add_argument('--stop-tol',
+                        type=float,
+                        help='Largest change of a Q value between checks that counts as settled',
+                        default=1e-3)
+
+    parser.add_argument('--stop-flips',
+                        type=int,
+                        help='Most greedy-action flips between checks that count as settled',
+                        default=0)
+
+    parser.add_argument('--patience',
+                        type=int,
+                        help='Settled checks in a row before stopping',
+                        default=5)
+
+def stopping_config(args: argparse.Namespace) -> dict:
+    """Returns the arguments of an EarlyStopping from the parsed options, or None if it is disabled."""
+    if not args.stop_every:
+        return None
+    return {'every': args.stop_every, 'tol': args.stop_tol, 'max_flips': args.stop_flips,
+            'patience': args.patience}
@@ -0,0 +1,130 @@
+# Standard
+# External
+import numpy as np
+# Local
+
+
+# Action encoding, matches the last axis of the (10, 21, 2) Q tables
+HIT = 0
+STICK = 1
+
+# Signed card of every card code 0-29: codes 0-9 are red (negative), 10-29 are black
+CARDS = np.array([-(code % 10 + 1) if code < 10 else code % 10 + 1 for code in range(30)], dtype=np.int64)
+
+class Easy21Batch():
+    """
+    Plays N independent Easy21 games at once, with the same rules as easy21.py.
+
+    Every game is kept as a slot in a set of arrays (player sum, dealer first card),
+    so one call to step() advances all N games together. Finished games are reset
+    automatically, so a slot always holds a live game.
+
+    The arrays step() returns are preallocated and overwritten by the next step, so
+    stepping allocates nothing of size N beyond the indices of the games involved.
+    Cards are drawn in large blocks and handed out through a cursor, as in
+    definitions.RandomStream, since the dealer's rounds draw only a few at a time.
+    """
+    def __init__(self, n: int=16384, seed: int=None, block: int=1 << 20):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.block = max(block, n)
+        self.refill_cards()
+
+        # Game state, one slot per game
+        self.d_first = np.zeros(n, dtype=np.int64)
+        self.p_sum = np.zeros(n, dtype=np.int64)
+
+        # Buffers returned by step(): terminal states, rewards and done mask
+        self.out_d_first = np.zeros(n, dtype=np.int64)
+        self.out_p_sum = np.zeros(n, dtype=np.int64)
+        self.rewards = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+
+        self.start()
+
+    def refill_cards(self):
+        # One draw per card, as a card code
+        self.cards = CARDS[self.rng.integers(0, 30, size=self.block, dtype=np.uint8)]
+        self.card_idx = 0
+
+    def draw_cards(self, k: int) -> np.ndarray:
+        """Draws k signed cards: value 1-10, negative for red (1/3), positive for black (2/3)."""
+        if self.card_idx + k > self.block:
+            self.refill_cards()
+        self.card_idx += k
+        return self.cards[self.card_idx - k:self.card_idx]
+
+    def draw_first_cards(self, k: int) -> np.ndarray:
+        """Draws k first cards, which are always black."""
+        return self.rng.integers(1, 11, size=k)
+
+    def start(self, idx: np.ndarray=None):
+        """(Re)starts the games at the indices idx, or all games if no indices are given."""
+        if idx is None:
+            self.p_sum[:] = self.draw_first_cards(self.n)
+            self.d_first[:] = self.draw_first_cards(self.n)
+        else:
+            self.p_sum[idx] = self.draw_first_cards(len(idx))
+            self.d_first[idx] = self.draw_first_cards(len(idx))
+
+    @property
+    def state(self):
+        """
+        Returns the current (dealer first card, player sum) arrays of all games, as
+        views of the game state, which the next step updates in place.
+        """
+        return self.d_first, self.p_sum
+
+    def dealer_play(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Plays the dealer's turn for the games in idx, and returns the dealer's sums.
+
+        As in Easy21.over, the dealer keeps hitting until they bust, reach 17-21,
+        or go above the player's sum. Every round only draws for the games whose
+        dealer is still playing, by index.
+        """
+        d_sum = self.d_first[idx]
+        p_sum = self.p_sum[idx]
+        live = np.flatnonzero((d_sum <= 16) & (d_sum <= p_sum)) # The first card is black, so d_sum >= 1
+        while len(live):
+            d = d_sum[live] + self.draw_cards(len(live))
+            d_sum[live] = d
+            live = live[(d >= 1) & (d <= 16) & (d <= p_sum[live])]
+        return d_sum
+
+    def step(self, actions: np.ndarray):
+        """
+        Takes one action per game (HIT or STICK) and returns the next states, the
+        rewards and the done mask, in buffers the next step overwrites.
+
+        The returned states of finished games are their terminal states; those games
+        are then restarted, and their new first states are available through state.
+        """
+        actions = np.asarray(actions)
+        rewards = self.rewards
+        done = self.done
+        rewards.fill(0)
+        done.fill(False)
+
+        # Player hits
+        hit = np.flatnonzero(actions == HIT)
+        p_sum = self.p_sum[hit] + self.draw_cards(len(hit))
+        self.p_sum[hit] = p_sum
+        busted = hit[(p_sum < 1) | (p_sum > 21)]
+        rewards[busted] = -1
+
+        # Player sticks, dealer plays and the winner is decided
+        stick = np.flatnonzero(actions == STICK)
+        d_sum = self.dealer_play(stick)
+        p_sum = self.p_sum[stick]
+        d_busted = (d_sum < 1) | (d_sum > 21)
+        rewards[stick] = np.where(d_busted, 1, np.sign(p_sum - d_sum))
+
+        # Keep the terminal states, then auto-reset the finished games
+        np.copyto(self.out_d_first, self.d_first)
+        np.copyto(self.out_p_sum, self.p_sum)
+        finished = np.concatenate((busted, stick))
+        done[finished] = True
+        self.start(finished)
+
+        return (self.out_d_first, self.out_p_sum), rewards, done
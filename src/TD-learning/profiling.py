@@ -0,0 +1,96 @@
+# Standard
+import cProfile
+import json
+import pstats
+import time
+# External
+# Local
+
+
+class PhaseProfiler():
+    """
+    Accumulates the time and number of calls of every phase of a training loop.
+
+    A phase is a set of methods or functions, which are wrapped with a timer on
+    attach and restored on detach, so the training loop costs nothing extra when
+    it is not profiled. Phases are timed inclusively: a phase called from another
+    one (e.g. the dealer rollout inside an env step) counts towards both.
+    """
+    def __init__(self):
+        self.times = {}
+        self.counts = {}
+        self.patches = []
+        self.total = 0.0
+        self.start_time = None
+
+    def wrap(self, owner, name: str, phase: str):
+        """Times every call of owner.name (an instance or a module attribute) as the phase."""
+        original = getattr(owner, name)
+        times, counts = self.times, self.counts
+        times.setdefault(phase, 0.0)
+        counts.setdefault(phase, 0)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = original(*args, **kwargs)
+            times[phase] += time.perf_counter() - start
+            counts[phase] += 1
+            return result
+
+        # Instance methods live on the class, so they are restored by deleting the wrapper
+        own = name in vars(owner)
+        self.patches.append((owner, name, original if own else None))
+        setattr(owner, name, timed)
+
+    def attach(self, targets: list):
+        """Wraps every (owner, name, phase) target and starts the clock."""
+        for owner, name, phase in targets:
+            self.wrap(owner, name, phase)
+        self.start_time = time.perf_counter()
+
+    def detach(self):
+        """Restores the wrapped methods and functions, and stops the clock."""
+        self.total += time.perf_counter() - self.start_time
+        for owner, name, original in reversed(self.patches):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self.patches = []
+
+    def summary(self) -> dict:
+        """Returns the total time, number of calls and time per call of every phase."""
+        phases = {phase: {'calls': self.counts[phase],
+                          'total_sec': self.times[phase],
+                          'per_call_us': 1e6 * self.times[phase] / self.counts[phase] if self.counts[phase] else 0.0,
+                          'share': self.times[phase] / self.total if self.total else 0.0}
+                  for phase in self.times}
+        return {'total_sec': self.total, 'phases': phases}
+
+    def report(self):
+        """Prints the phases, from the most to the least expensive."""
+        summary = self.summary()
+        print(f'Profiled {summary["total_sec"]:.2f} sec')
+        for phase, stats in sorted(summary['phases'].items(), key=lambda item: -item[1]['total_sec']):
+            print(f'\t{phase:<16} {stats["calls"]:>10} calls'
+                  f' {stats["total_sec"]:>9.3f} sec'
+                  f' {stats["per_call_us"]:>9.2f} us/call'
+                  f' {stats["share"]:>7.1%}')
+
+    def save(self, savepath: str):
+        """Saves the summary as JSON."""
+        with open(savepath, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+def profile_call(func, profiler: PhaseProfiler, savepath: str):
+    """
+    Runs func under cProfile, then saves the cProfile stats to savepath.prof and
+    the per-phase summary of the profiler to savepath.json.
+    """
+    profile = cProfile.Profile()
+    profile.runcall(func)
+    profile.dump_stats(f"{savepath}.prof")
+    profiler.save(f"{savepath}.json")
+
+    profiler.report()
+    pstats.Stats(profile).sort_stats('cumulative').print_stats(15)
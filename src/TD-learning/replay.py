@@ -0,0 +1,157 @@
+# Standard
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import time
+# External
+import numpy as np
+# Local
+from definitions import State
+from sweep import save_results
+from td_learning import SarlsaLamda
+from trajectories import TrajectoryReader, to_episodes
+
+
+# Next state of the last step of a game that ended with a hit (the player busted)
+BUSTED = State(1, 0)
+
+def replay(TD: SarlsaLamda, log: TrajectoryReader, passes: int=1, shuffle: bool=False,
+           batch_size: int=4096, seed: int=None):
+    """
+    Trains Sarsa(lamda) offline, from the episodes of a trajectory log.
+
+    Every pass runs the Sarsa(lamda) update over all the logged steps, read in
+    batches of batch_size episodes, in file order or in a new random order per pass.
+    Each step bootstraps from the logged next state and action. The log stops at the
+    last action, so the game after it is rebuilt: a final hit busted the player, and
+    a final stick stays in its state, followed by the currently greedy action.
+
+    Every step needs its own reward, so only logs of the TD and LFA runners, which
+    both log the reward of every game step, can be replayed.
+    """
+    if log.runner not in ('td', 'lfa'):
+        raise ValueError(f"Can only replay logs of the td or lfa runners, not {log.runner}: "
+                         "the MC runner only logs the reward at the end of a game")
+
+    rng = np.random.default_rng(seed)
+    start_time = time.time()
+    for i in range(passes):
+        order = rng.permutation(len(log)) if shuffle else None
+        for records, offsets in log.batches(batch_size, order):
+            for states, actions, rewards in to_episodes(records, offsets):
+                TD.Es.reset()
+                last = len(states) - 1
+                for t in range(last + 1):
+                    state, action = states[t], actions[t]
+                    if t < last:
+                        new_state, new_action = states[t + 1], actions[t + 1]
+                    elif action == 's':
+                        new_state, new_action = state, TD.Qs.argmax(state)
+                    else:
+                        new_state, new_action = BUSTED, 'h'
+                    TD.learn(state, action, rewards[t], new_state, new_action)
+
+        elapsed_time = time.time() - start_time
+        print(f'Replayed pass {i + 1}/{passes} of {len(log)} episodes in {elapsed_time:.2f} sec...')
+
+def replay_config(config: dict) -> dict:
+    """Trains Sarsa(lamda) from the log for a single configuration, in a worker process."""
+    TD = SarlsaLamda(gamma=config['gamma'], lamda=config['lamda'], alpha=config['alpha'])
+    start_time = time.time()
+    replay(TD, TrajectoryReader(config['log']), config['passes'], config['shuffle'],
+           config['batch_size'], config['seed'])
+    duration = time.time() - start_time
+
+    return {**config, 'Q': TD.Qs.avfs.copy(), 'duration': duration}
+
+def replay_sweep(log: str, lamdas: list, alphas: list, gammas: list, passes: int=1,
+                 shuffle: bool=False, batch_size: int=4096, max_workers: int=None, seed: int=0) -> dict:
+    """
+    Trains Sarsa(lamda) from the same trajectory log for every combination of lamda,
+    alpha and gamma on a process pool. Every worker maps the log, so the operating
+    system shares its pages between them.
+
+    Returns a results bundle with one entry per run, in the order of the grid.
+    """
+    grid = list(itertools.product(lamdas, alphas, gammas))
+    seeds = [int(ss.generate_state(1)[0])
+             for ss in np.random.SeedSequence(seed).spawn(len(grid))]
+    configs = [{'lamda': lamda, 'alpha': alpha, 'gamma': gamma, 'seed': s, 'log': log,
+                'passes': passes, 'shuffle': shuffle, 'batch_size': batch_size}
+               for (lamda, alpha, gamma), s in zip(grid, seeds)]
+
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(replay_config, configs))
+    print(f'Finished {len(results)} runs in {time.time() - start_time:.2f} sec')
+
+    return {key: np.array([r[key] for r in results])
+            for key in ['lamda', 'alpha', 'gamma', 'seed', 'Q', 'duration']}
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Train Sarsa(lamda) offline from a trajectory log.')
+
+    # Adding a positional argument
+    parser.add_argument('log',
+                        type=str,
+                        help='Path of the trajectory log')
+
+    parser.add_argument('--lamdas',
+                        type=float,
+                        nargs='+',
+                        help='Eligibility trace decay rates',
+                        default=[0.5])
+
+    parser.add_argument('--alphas',
+                        type=float,
+                        nargs='+',
+                        help='Learning rates',
+                        default=[0.01])
+
+    parser.add_argument('--gammas',
+                        type=float,
+                        nargs='+',
+                        help='Discount factors',
+                        default=[0.98])
+
+    parser.add_argument('--passes',
+                        type=int,
+                        help='Number of passes over the log',
+                        default=1)
+
+    parser.add_argument('--shuffle',
+                        action='store_true',
+                        help='Replay the episodes in a new random order every pass')
+
+    parser.add_argument('--batch-size',
+                        type=int,
+                        help='Number of episodes read at once',
+                        default=4096)
+
+    parser.add_argument('--workers',
+                        type=int,
+                        help='Number of worker processes (default: one per core)',
+                        default=None)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Base seed the per-run episode orders are spawned from',
+                        default=0)
+
+    parser.add_argument('--output',
+                        type=str,
+                        help='Path of the npz results bundle',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "replay.npz"))
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    results = replay_sweep(args.log, args.lamdas, args.alphas, args.gammas, args.passes,
+                           args.shuffle, args.batch_size, args.workers, args.seed)
+    save_results(results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Standard
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import time
+# External
+import numpy as np
+# Local
+from definitions import stream
+from early_stopping import EarlyStopping, add_stopping_arguments, stopping_config
+from td_learning import SarlsaLamda
+
+
+def run_config(config: dict) -> dict:
+    """Runs Sarsa(lamda) for a single configuration, in a worker process."""
+    stream.seed(config['seed'])
+
+    TD = SarlsaLamda(gamma=config['gamma'], lamda=config['lamda'], alpha=config['alpha'])
+    stopping = EarlyStopping(**config['stopping']) if config['stopping'] else None
+    start_time = time.time()
+    TD.run(config['episodes'], num_iter=config['episodes'], plot=False, stopping=stopping)
+    duration = time.time() - start_time
+
+    stopped_at = stopping.stopped_at if stopping is not None else None
+    return {**config, 'Q': TD.Qs.avfs.copy(), 'duration': duration,
+            'episodes_run': stopped_at or config['episodes']}
+
+def sweep(lamdas: list, alphas: list, gammas: list, episodes: list,
+          max_workers: int=None, seed: int=0, stopping: dict=None) -> dict:
+    """
+    Runs Sarsa(lamda) for every combination of lamda, alpha, gamma and number
+    of episodes on a process pool, each run with its own independent seed.
+    With stopping, the arguments of an EarlyStopping, runs end once their Q settles.
+
+    Returns a results bundle with one entry per run, in the order of the grid.
+    """
+    grid = list(itertools.product(lamdas, alphas, gammas, episodes))
+    seeds = [int(ss.generate_state(1)[0])
+             for ss in np.random.SeedSequence(seed).spawn(len(grid))]
+    configs = [{'lamda': lamda, 'alpha': alpha, 'gamma': gamma, 'episodes': n, 'seed': s,
+                'stopping': stopping}
+               for (lamda, alpha, gamma, n), s in zip(grid, seeds)]
+
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(run_config, configs))
+    print(f'Finished {len(results)} runs in {time.time() - start_time:.2f} sec')
+
+    return {key: np.array([r[key] for r in results])
+            for key in ['lamda', 'alpha', 'gamma', 'episodes', 'seed', 'Q', 'duration', 'episodes_run']}
+
+def save_results(results: dict, savepath: str):
+    """Saves the results bundle as a single npz file."""
+    np.savez(savepath, **results)
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Run a parallel Sarsa(lamda) parameter sweep.')
+
+    parser.add_argument('--lamdas',
+                        type=float,
+                        nargs='+',
+                        help='Eligibility trace decay rates',
+                        default=[round(0.1 * i, 1) for i in range(11)])
+
+    parser.add_argument('--alphas',
+                        type=float,
+                        nargs='+',
+                        help='Learning rates',
+                        default=[0.01])
+
+    parser.add_argument('--gammas',
+                        type=float,
+                        nargs='+',
+                        help='Discount factors',
+                        default=[0.98])
+
+    parser.add_argument('--episodes',
+                        type=int,
+                        nargs='+',
+                        help='Numbers of episodes to run',
+                        default=[10000])
+
+    parser.add_argument('--workers',
+                        type=int,
+                        help='Number of worker processes (default: one per core)',
+                        default=None)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Base seed the per-run seeds are spawned from',
+                        default=0)
+
+    # Early-stopping options, shared with the other scripts
+    add_stopping_arguments(parser)
+
+    parser.add_argument('--output',
+                        type=str,
+                        help='Path of the npz results bundle',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "sweep.npz"))
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    results = sweep(args.lamdas, args.alphas, args.gammas, args.episodes, args.workers, args.seed,
+                    stopping_config(args))
+    save_results(results, args.output)
+
+if __name__ == "__main__":
+    main()
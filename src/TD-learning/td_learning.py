@@ -1,50 +1,132 @@
 # Standard
 import argparse
+import os
+import sys
 import time
-import random
 # External
+import numpy as np
 from numpy import mean
 # Local
+from checkpoint import Checkpointer, load_checkpoint, pack, unpack
+from definitions import State, stream
 from easy21 import Easy21
+from early_stopping import EarlyStopping, add_stopping_arguments, stopping_config
 from td_learning_functions import StateHistory, EligibilityTraces, ActionValueFunctions
-from td_learning_functions import td_error, greedy_policy
+from td_learning_functions import td_error, greedy_policy, behavior_prob, ACTION_IDX
+from mse_tracker import MSETracker
+from profiling import PhaseProfiler, profile_call
+from trajectories import TrajectoryWriter
 from visualization import plot_results
 
    
 class SarlsaLamda():
-    def __init__(self, gamma: float=0.98, lamda: float=0.5, alpha: float=0.01):
-        self.game = Easy21()
+    def __init__(self, gamma: float=0.98, lamda: float=0.5, alpha: float=0.01, fast_dealer: bool=False,
+                 N0: float=100):
+        self.game = Easy21(fast_dealer)
 
         # Initialize parameters
         self.gamma = gamma # Discount factor
         self.lamda = lamda # Eligibility trace decay rate
         self.alpha = alpha # Learning rate
+        self.N0 = N0 # Exploration constant
 
         # Initialize state and state-action history
         self.H_s = StateHistory()
         self.Qs = ActionValueFunctions(alpha)
         self.Es = EligibilityTraces(gamma, lamda)
 
+    def get_checkpoint(self, episode: int, stopping: EarlyStopping=None) -> dict:
+        """Returns everything needed to resume training, and the early-stopping checks if given, at the given episode."""
+        return {'episode': episode,
+                'N_s': self.H_s.state_counts,
+                'Q': self.Qs.avfs,
+                'stream': pack(stream.get_state()),
+                **(stopping.get_checkpoint() if stopping is not None else {})}
+
+    def load_checkpoint(self, data: dict, stopping: EarlyStopping=None) -> int:
+        """Restores training, and the early-stopping checks if given, from a checkpoint, and returns the episode to resume at."""
+        if stopping is not None:
+            stopping.load_checkpoint(data)
+        self.H_s.state_counts[:] = data['N_s']
+        self.Qs.avfs[:] = data['Q']
+        stream.set_state(unpack(data['stream']))
+        return int(data['episode'])
+
+    def learn(self, state: State, action: str, reward: int, new_state: State, new_action: str):
+        """Applies the Sarsa(lamda) update of one step (S, A, R, S', A')."""
+        # Get TD-error
+        Q = self.Qs.get(state, action)
+        new_Q = self.Qs.get(new_state, new_action)
+        delta = td_error(reward, Q, new_Q, self.gamma)
+
+        # Update state counts, eligibility traces, action value functions
+        self.Es.update(state, action)
+        self.Qs.update(delta, self.Es)
+        self.H_s.add(state)
+
+    def profile_targets(self) -> list:
+        """Returns the (owner, name, phase) of every method and function to time when profiling."""
+        module = sys.modules[__name__]
+        return [
+            (self.game, 'step', 'env step'),
+            (self.game.dealer, 'step', 'dealer rollout'),
+            (self.game.dealer, 'finish', 'dealer rollout'),
+            (self.Qs, 'argmax', 'argmax'),
+            (module, 'greedy_policy', 'policy'),
+            (self.Qs, 'get', 'Q lookup'),
+            (module, 'td_error', 'TD error'),
+            (self.Es, 'update', 'trace update'),
+            (self.Qs, 'update', 'Q update'),
+            (self.H_s, 'add', 'count update')]
+
     def run(self, 
             num_episodes: int=1000, 
-            num_iter: int=1000):
+            num_iter: int=1000,
+            plot: bool=True,
+            Q_ref: np.ndarray=None,
+            mse_every: int=1,
+            checkpoint: Checkpointer=None,
+            start_episode: int=0,
+            profiler: PhaseProfiler=None,
+            log: TrajectoryWriter=None,
+            stopping: EarlyStopping=None):
         """
         Runs TD-Learning with Sarsa(lamda).
         
         num_episodes: number of episodes to run
         num_iter: logging period (log every X number of iteratios)
+        plot: whether to plot the value function at the end
+        Q_ref: reference Q (10, 21, 2) to track the MSE against, stored in self.errors
+        mse_every: MSE sampling period (record every X number of episodes)
+        checkpoint: writes a checkpoint every checkpoint.every episodes, if given
+        start_episode: episode to start at, when resuming from a checkpoint
+        profiler: times the phases of the loop, if given
+        log: appends every episode to a trajectory log, if given
+        stopping: stops once Q has settled, if given
         gamma: discount factor
         """
+        # Track the MSE against the reference Q
+        self.errors = MSETracker(Q_ref, num_episodes, mse_every,
+                                  start_episode=start_episode) if Q_ref is not None else None
+
+        # Time the phases of the loop
+        if profiler is not None:
+            profiler.attach(self.profile_targets())
+
         # Simulate X number of episodes
         start_time = time.time()
         prev_time = time.time()
-        for i in range(num_episodes):
+        for i in range(start_episode, num_episodes):
             # Initial state
             self.game.start()
+            self.Es.reset()
 
             # Randomly initialize the state and action
             state = self.game.first_state
-            action = 'h' if random.random() < 0.5 else 's'
+            action = 'h' if stream.uniform() < 0.5 else 's'
+            prob = 0.5 # Behavior probability of the action
+            if log is not None:
+                ep_states, ep_actions, ep_rewards, ep_probs = [], [], [], []
 
             # Run the game until it is over
             while not self.game.over:
@@ -53,25 +135,47 @@ class SarlsaLamda():
                 greedy_action = self.Qs.argmax(state)
 
                 # Decide an action based on the greedy policy
-                new_action = greedy_policy(state_count, greedy_action)
+                new_action = greedy_policy(state_count, greedy_action, self.N0)
 
                 # 1 game step and get reward
                 new_state, reward = self.game.step(state, action)
 
-                # Get TD-error
-                Q = self.Qs.get(state, action)
-                new_Q = self.Qs.get(new_state, new_action)
-                delta = td_error(reward, Q, new_Q, self.gamma)
+                # Learn from the step
+                self.learn(state, action, reward, new_state, new_action)
 
-                # Update state counts, eligibility traces, action value functions
-                self.Es.update(state, action)
-                self.Qs.update(state, action, delta, self.Es)
-                self.H_s.add(state)
+                # Log the step, and the behavior probability of the next action
+                if log is not None:
+                    ep_states.append(state.id)
+                    ep_actions.append(ACTION_IDX[action])
+                    ep_rewards.append(reward)
+                    ep_probs.append(prob)
+                    prob = behavior_prob(state_count, greedy_action, new_action, self.N0)
 
                 # Update state and action
                 state = new_state
                 action = new_action
 
+            # Log the episode
+            if log is not None:
+                log.add(ep_states, ep_actions, ep_rewards, ep_probs)
+
+            # Record the MSE against the reference Q
+            if self.errors is not None and (i + 1) % mse_every == 0:
+                self.errors.record(self.Qs.avfs)
+
+            # Check whether Q has settled, before the checkpoint saves the state of the checks
+            settled = stopping is not None and (i + 1) % stopping.every == 0 and stopping.check(self.Qs.avfs)
+
+            # Save a checkpoint in the background
+            if checkpoint is not None and (i + 1) % checkpoint.every == 0:
+                checkpoint.save(self.get_checkpoint(i + 1, stopping))
+
+            # Stop once Q has settled
+            if settled:
+                print(f'Q settled, stopping after {i + 1} episodes')
+                stopping.stopped_at = num_episodes = i + 1
+                break
+
             # For large runs, print out the progress intermittently
             if i % num_iter == 0:
                 elapsed_time = time.time() - start_time
@@ -80,7 +184,18 @@ class SarlsaLamda():
                 print(f"\tAverage episode duration: {avg_duration:.5f}")
                 prev_time = time.time()
 
-        plot_results(self.Qs, num_episodes, self.lamda)
+        if profiler is not None:
+            profiler.detach()
+        if log is not None:
+            log.flush()
+        if self.errors is not None:
+            self.errors.flush()
+            self.errors.truncate()
+        if checkpoint is not None:
+            checkpoint.wait()
+
+        if plot:
+            plot_results(self.Qs, num_episodes, self.lamda)
 
 
 def main():
@@ -100,11 +215,80 @@ def main():
                         help='Eligibility trace decay rate', 
                         default=0.5)
 
+    parser.add_argument('--reference',
+                        type=str,
+                        help='Path of a reference Q (.npy) to track the MSE against',
+                        default=None)
+
+    parser.add_argument('--mse-every',
+                        type=int,
+                        help='MSE sampling period, in episodes',
+                        default=1)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the card and exploration stream',
+                        default=None)
+
+    parser.add_argument('--fast-dealer',
+                        action='store_true',
+                        help="Sample the dealer's final sum from a precomputed distribution")
+
+    parser.add_argument('--checkpoint-every',
+                        type=int,
+                        help='Checkpoint period, in episodes (0 disables checkpoints)',
+                        default=0)
+
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Resume from the last checkpoint')
+
+    parser.add_argument('--log',
+                        type=str,
+                        help='Path of a trajectory log to append every episode to',
+                        default=None)
+
+    # Early-stopping options, shared with the other scripts
+    add_stopping_arguments(parser)
+
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help='Time every phase of the loop, and save the cProfile stats and a JSON summary')
+
     # Parsing the arguments
     args = parser.parse_args()
+    stream.seed(args.seed)
+    Q_ref = np.load(args.reference) if args.reference else None
+
+    TD = SarlsaLamda(lamda=args.lamda, fast_dealer=args.fast_dealer)
+
+    # Stop once Q has settled
+    config = stopping_config(args)
+    stopping = EarlyStopping(**config) if config else None
+
+    # Resume from and save checkpoints, along with the state of the early-stopping checks
+    checkpoint_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"checkpoint-{args.lamda}")
+    checkpoint = Checkpointer(checkpoint_path, args.checkpoint_every) if args.checkpoint_every else None
+    start_episode = TD.load_checkpoint(load_checkpoint(checkpoint_path, mmap_mode='r'), stopping) if args.resume else 0
+
+    # Append the episodes to a trajectory log
+    log = TrajectoryWriter(args.log, 'td') if args.log else None
 
-    TD = SarlsaLamda(lamda=args.lamda)
-    TD.run(args.episodes)
+    # Profile the run, saving the cProfile stats and the per-phase summary
+    profiler = PhaseProfiler() if args.profile else None
+    run = lambda: TD.run(args.episodes, Q_ref=Q_ref, mse_every=args.mse_every, checkpoint=checkpoint,
+                         start_episode=start_episode, profiler=profiler, log=log, stopping=stopping)
+    if profiler is not None:
+        profile_call(run, profiler, os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"profile-{args.lamda}"))
+    else:
+        run()
+    if log is not None:
+        log.close()
+    if Q_ref is not None:
+        if len(TD.errors.mse):
+            print(f"Final MSE: {TD.errors.mse[-1]:.5f}, greedy-policy disagreement: {TD.errors.disagreement[-1]:.3f}")
+        else:
+            print(f"No MSE recorded: no episode of the run was a multiple of --mse-every")
 
 if __name__ == "__main__":
     main()
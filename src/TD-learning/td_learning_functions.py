@@ -1,114 +1,113 @@
 # Standard
-import random
+from typing import Literal
 # External
 import numpy as np
 # Local
-from definitions import State, Deck
+from definitions import State, NUM_STATES, TERMINAL, stream
 
 
+# Action index along the last axis of the tables
+ACTION_IDX = {'h': 0, 's': 1}
+
 class StateHistory():
     """Stores state visits."""
     def __init__(self):
-        deck = Deck()
-        self.state_counts = {(card_id, p_sum): 0
-                             for card_id in deck.all_cards
-                             for p_sum in range(1, 22)}
+        # Dealer card 1-10 x player sum 1-21
+        self.state_counts = np.zeros((10, 21), dtype=np.int64)
+        self.counts = self.state_counts.reshape(NUM_STATES) # Indexed by state id
 
     def add(self, s: State):
         """Increases the count of a state's visits."""
-        self.state_counts[s.to_key()] += 1
+        self.counts[s.id] += 1
 
     def get(self, s: State):
         """Returns the number of visits of a specific state."""
-        return self.state_counts[s.to_key()]
+        return self.counts[s.id]
 
 class EligibilityTraces():
     """
     Eligibility Traces show how eligible for update every state-action pair is.
     The most recently visited state-action pairs have the highest eligibility (1),
     and they decay over time.
+
+    Only the non-zero traces are stored, keyed by (state id, action), so an update
+    costs O(episode length) instead of O(number of state-action pairs). Traces that
+    decay below the cutoff are dropped.
     """
-    def __init__(self, gamma, lamda):
+    def __init__(self, gamma, lamda, cutoff=1e-4,
+                 kind: Literal['accumulating', 'replacing']='accumulating'):
         self.gamma = gamma
         self.lamda = lamda
-        deck = Deck()
-        self.Es = {(d_first_card_id, p_sum, action): 0
-                   for d_first_card_id in deck.all_cards
-                   for p_sum in range(1, 22)
-                   for action in ['h', 's']}
+        self.cutoff = cutoff
+        self.kind = kind
+        self.Es = {}
+
+    def reset(self):
+        """Clears all traces, at the start of an episode."""
+        self.Es.clear()
         
     def update(self, s: State, a: str):
-        """Increases the Eligibility Traces based on the td error 
-        and the count of the current state-action pairs N."""
-        for k, v in self.Es.items():
-            v = self.gamma * self.lamda * v
-            if (str(s.d_first_card), s.p_sum, a) == k:
-                v += 1
-            self.Es[(str(s.d_first_card), s.p_sum, a)] = v
+        """Decays the active Eligibility Traces and marks the
+        current state-action pair as eligible."""
+        decay = self.gamma * self.lamda
+        for k in list(self.Es):
+            v = decay * self.Es[k]
+            if v < self.cutoff:
+                del self.Es[k]
+            else:
+                self.Es[k] = v
+
+        k = (s.id, ACTION_IDX[a])
+        if self.kind == 'replacing':
+            self.Es[k] = 1
+        else:
+            self.Es[k] = self.Es.get(k, 0) + 1
         
     def get(self, s: State, a: str):
         """Returns the Eligibility Trace E(s, a)"""
-        if s.p_sum >= 1 and s.p_sum <= 21:
-            return self.Es[(str(s.d_first_card), s.p_sum, a)]
-        else:
-            return -1
+        return self.Es.get((s.id, ACTION_IDX[a]), 0)
+
+    def items(self):
+        """Returns the ((state id, action), trace) pairs of the active traces."""
+        return self.Es.items()
         
 class ActionValueFunctions():
     def __init__(self, alpha=0.1):
         self.alpha = alpha
-        deck = Deck()
-        self.avfs = {(d_first_card_id, p_sum, action): 0
-                     for d_first_card_id in deck.all_cards
-                     for p_sum in range(1, 22)
-                     for action in ['h', 's']}
+        # Dealer card 1-10 x player sum 1-21 x action h/s
+        self.avfs = np.zeros((10, 21, 2))
+        self.Q = self.avfs.reshape(NUM_STATES, 2) # Indexed by state id, action
+        self.best_avfs = np.zeros((10, 21))
         
-    def update(self, s: State, a: str, td_error: float, Es: EligibilityTraces):
-        """Increases the AVF value based on the td error and the count of
-        the current state-action pairs N."""
-        Q = self.avfs[(str(s.d_first_card), s.p_sum, a)]
-        Q = Q + self.alpha * td_error * Es.get(s, a)
-        self.avfs[(str(s.d_first_card), s.p_sum, a)] = Q
+    def update(self, td_error: float, Es: EligibilityTraces):
+        """Increases the AVF values of all the eligible state-action pairs
+        based on the td error and their eligibility traces."""
+        step = self.alpha * td_error
+        for idx, e in Es.items():
+            self.Q[idx] += step * e
         
     def get(self, s: State, a: str):
         """Returns the Action Value Function Q(s, a)"""
-        if s.p_sum >= 1 and s.p_sum <= 21:
-            return self.avfs[(str(s.d_first_card), s.p_sum, a)]
+        if s.id != TERMINAL:
+            return self.Q[s.id, ACTION_IDX[a]]
         else:
             return -1
 
     def argmax(self, s: State) -> str:
         """Returns the Action that maximizes Q in the current state"""
-        # Extracting the sub-dictionary for the current state
-        state_avfs = {action: q_value 
-                    for (d_first_card_id, p_sum, action), q_value in self.avfs.items()
-                    if d_first_card_id == str(s.d_first_card) and p_sum == s.p_sum}
-        
-        # Finding the action that maximizes the Q value
-        greedy_action = max(state_avfs, key=state_avfs.get)
-        
-        return greedy_action
+        # Ties go to hitting, as the first action
+        q_h, q_s = self.Q[s.id]
+        return 'h' if q_h >= q_s else 's'
     
-    def max(self) -> str:
+    def max(self) -> np.ndarray:
         """
         Returns the best Action Value Functions for every state.
         
         Basically, picks the highest Q out of the 2 possible actions for every state.
+        The result is written into a preallocated (10, 21) buffer, which is reused
+        by the next call.
         """
-        # Initialize a 3D NumPy array
-        q_values_array = np.zeros((10, 21, 2)) # 10 21 2
-
-        # Populate the 4D array
-        for (d_first_card_id, p_sum, action), q_value in self.avfs.items():
-            card_index = int(str(d_first_card_id)[1:]) - 1  # Convert card 'b1'...'b10' to 0...9
-            p_sum_index = p_sum - 1  # Convert p_sum 1...21 to 0...20
-            action_index = 0 if action == 'h' else 1  # Convert action 'h'/'s' to 0/1
-            q_values_array[card_index, p_sum_index, action_index] = q_value
-
-        # Find the best action for each (d_first_card_id, p_sum) pair
-        best_actions_q_values = np.max(q_values_array, axis=2) # 10 21
-
-        # All_q_values now contains your original q_values plus the best q_values in the last slice of the third dimension
-        return best_actions_q_values
+        return np.max(self.avfs, axis=2, out=self.best_avfs)
     
 def greedy_policy(N_s, a_star, N0=100):
     """
@@ -123,7 +122,13 @@ def greedy_policy(N_s, a_star, N0=100):
 
     explore_action = 's' if a_star == 'h' else 'h'
         
-    return a_star if random.random() < prob else explore_action
+    return a_star if stream.uniform() < prob else explore_action
+
+def behavior_prob(N_s, a_star, a, N0=100):
+    """Returns the probability greedy_policy had of choosing the action a."""
+    e = N0 / (N0 + N_s)
+    prob = e / 2 + 1 - e
+    return prob if a == a_star else 1 - prob
 
 def td_error(reward, Q, Q_next, gamma):
     """
@@ -0,0 +1,194 @@
+# Standard
+import os
+# External
+import numpy as np
+# Local
+from definitions import State
+
+
+# One fixed-width record per step: the state the action was taken in (state id),
+# the action (0: hit, 1: stick), the reward that followed it, and the probability
+# the behavior policy had of taking it
+RECORD = np.dtype([('episode', '<u4'),
+                   ('state', '<u2'),
+                   ('action', 'u1'),
+                   ('reward', 'i1'),
+                   ('prob', '<f4')])
+
+# The header holds the record size and the runner that wrote the log ('mc', 'td'
+# or 'lfa'): the MC runner only logs the reward at the end of a game, the TD and
+# LFA runners log the reward of every step
+MAGIC = b'E21TRAJ2'
+HEADER_SIZE = len(MAGIC) + 8 + 8
+
+def header(runner: str) -> bytes:
+    """Returns the header of a log written by a runner."""
+    return MAGIC + np.uint64(RECORD.itemsize).tobytes() + runner.encode().ljust(8, b'\0')
+
+def read_header(path: str) -> tuple:
+    """Returns the runner that wrote a log, and the size of its header."""
+    with open(path, 'rb') as f:
+        data = f.read(HEADER_SIZE)
+    size = np.uint64(RECORD.itemsize).tobytes()
+    if data[:16] == MAGIC + size and len(data) == HEADER_SIZE:
+        return data[16:].rstrip(b'\0').decode(), HEADER_SIZE
+    raise ValueError(f"{path} is not a trajectory log with {RECORD.itemsize}-byte records")
+
+# State and action of every state id and action index, to replay records
+STATES = [State(d_first, p_sum) for d_first in range(1, 11) for p_sum in range(1, 22)]
+ACTIONS = ['h', 's']
+
+class TrajectoryWriter():
+    """
+    Appends episodes to a binary trajectory log.
+
+    Steps are collected in Python lists and written as one chunk of records once
+    chunk steps have been collected, so logging an episode is a few list extends.
+    Episode ids continue from the last episode already in the file, which must have
+    been written by the same runner. A partial record left at its end by an
+    interrupted write is dropped first.
+    """
+    def __init__(self, path: str, runner: str, chunk: int=1 << 20):
+        self.path = path
+        self.runner = runner # 'mc', 'td' or 'lfa'
+        self.chunk = chunk # Steps per write
+
+        # Continue the episode ids of an existing log
+        self.next_episode = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            log_runner, offset = read_header(path)
+            if log_runner != runner:
+                raise ValueError(f"{path} was written by the {log_runner} runner, not {runner}")
+
+            # Drop the partial record an interrupted write left at the end, which
+            # would shift every record appended after it
+            size = os.path.getsize(path)
+            end = size - (size - offset) % RECORD.itemsize
+            if end < size:
+                os.truncate(path, end)
+
+            log = TrajectoryReader(path)
+            if len(log.records):
+                self.next_episode = int(log.records['episode'][-1]) + 1
+
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(header(runner))
+        self.reset()
+
+    def reset(self):
+        self.first_episode = self.next_episode
+        self.lengths = []
+        self.states = []
+        self.actions = []
+        self.rewards = []
+        self.probs = []
+
+    def add(self, states: list, actions: list, rewards: list, probs: list) -> int:
+        """
+        Logs an episode, given as the state ids, action indices, rewards and behavior
+        probabilities of its steps. Returns the id of the episode.
+        """
+        self.lengths.append(len(states))
+        self.states.extend(states)
+        self.actions.extend(actions)
+        self.rewards.extend(rewards)
+        self.probs.extend(probs)
+
+        episode = self.next_episode
+        self.next_episode += 1
+        if len(self.states) >= self.chunk:
+            self.flush()
+        return episode
+
+    def flush(self):
+        """Writes the collected steps as one chunk of records."""
+        if not self.states:
+            return
+        records = np.empty(len(self.states), dtype=RECORD)
+        records['episode'] = np.repeat(np.arange(self.first_episode, self.next_episode), self.lengths)
+        records['state'] = self.states
+        records['action'] = self.actions
+        records['reward'] = self.rewards
+        records['prob'] = self.probs
+        records.tofile(self.file)
+        self.file.flush()
+        self.reset()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryReader():
+    """
+    Reads a trajectory log through a memory map.
+
+    Episodes are returned as slices of the mapped records, so reading them copies
+    nothing, and only the pages that are touched are loaded from disk.
+    """
+    def __init__(self, path: str):
+        self.runner, offset = read_header(path) # Runner that wrote the log
+
+        n = (os.path.getsize(path) - offset) // RECORD.itemsize
+        self.records = (np.memmap(path, dtype=RECORD, mode='r', offset=offset, shape=(n,))
+                        if n else np.empty(0, dtype=RECORD))
+
+        # Start of every episode, and the end of the last one
+        episodes = self.records['episode']
+        starts = np.flatnonzero(episodes[1:] != episodes[:-1]) + 1
+        self.bounds = np.concatenate(([0], starts, [n])) if n else np.zeros(1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        """Number of episodes."""
+        return len(self.bounds) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """Returns the records of the i-th episode."""
+        return self.records[self.bounds[i]:self.bounds[i + 1]]
+
+    def __iter__(self):
+        return self.episodes()
+
+    def episodes(self, order: np.ndarray=None):
+        """Yields the records of every episode, in the given order of episode indices."""
+        bounds = self.bounds
+        records = self.records
+        for i in (range(len(self)) if order is None else order):
+            yield records[bounds[i]:bounds[i + 1]]
+
+    def batches(self, size: int=4096, order: np.ndarray=None):
+        """
+        Yields the episodes in batches of size episodes, in the given order of episode
+        indices, as the batch's records and the offsets of its episodes within them.
+
+        In file order, a batch is a slice of the mapped records; in any other order,
+        its episodes are gathered into a copy.
+        """
+        bounds = self.bounds
+        records = self.records
+        for start in range(0, len(self), size):
+            if order is None:
+                stop = min(start + size, len(self))
+                yield records[bounds[start]:bounds[stop]], bounds[start:stop + 1] - bounds[start]
+            else:
+                chunk = np.asarray(order[start:start + size])
+                starts = bounds[chunk]
+                lengths = bounds[chunk + 1] - starts
+                offsets = np.concatenate(([0], np.cumsum(lengths)))
+                idx = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], lengths)
+                yield records[idx], offsets
+
+def to_episodes(records: np.ndarray, offsets: np.ndarray):
+    """Yields the states, actions and rewards of every episode of a batch of records."""
+    states = [STATES[s] for s in records['state'].tolist()]
+    actions = [ACTIONS[a] for a in records['action'].tolist()]
+    rewards = records['reward'].tolist()
+    offsets = offsets.tolist()
+    for a, b in zip(offsets[:-1], offsets[1:]):
+        yield states[a:b], actions[a:b], rewards[a:b]
@@ -1,28 +1,37 @@
 # Standard
+import argparse
+import multiprocessing
 import os
 # External
-import matplotlib
-matplotlib.use('Qt5Agg')
-from matplotlib import pyplot as plt
-import matplotlib.cm as cm
 import numpy as np
 # Local
 from td_learning_functions import ActionValueFunctions
 
 
-def plot_results(Qs: ActionValueFunctions, num_episodes: int, lamda: float):
-    """Plots the optimal value functions in a 3D plot."""    
-    # Extract the best action-value functions, along with the states
-    # Basically, the best value function out of the 2, corresponding to the 2 possible actions
-    best_qs = Qs.max()
-    
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def render_surface(arraypath: str, title: str, savepath: str, show: bool=False):
+    """
+    Renders a saved array of the best value functions (10, 21) as a 3D surface plot.
+
+    matplotlib is only imported here, and uses the non-interactive Agg backend
+    unless the plot is shown.
+    """
+    import matplotlib
+    if not show:
+        matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    import matplotlib.cm as cm
+
+    best_qs = np.load(arraypath)
+
     # Extract the xs, ys, zs for the 3d plot
     xs = np.arange(1, 11)
     ys = np.arange(1, 22)
 
     # Creating meshgrid
     X, Y = np.meshgrid(xs, ys)
-    
+
     # Prepare the zs
     # In a surface plot, Z needs to be in the same shape as X and Y
     Z = best_qs.T
@@ -30,13 +39,13 @@ def plot_results(Qs: ActionValueFunctions, num_episodes: int, lamda: float):
     # Draw the plot
     fig = plt.figure(figsize=(12, 8))
     ax = fig.add_subplot(111, projection='3d')
-    
+
     ax.plot_surface(X, Y, Z, cmap=cm.coolwarm, antialiased=False)
-    
+
     # Set axis titles
     ax.set_xlabel("Dealer's First Card")
     ax.set_ylabel("Player Sum")
-    ax.set_title(f"Value Function - # Episodes: {num_episodes}")
+    ax.set_title(title)
 
     # Set axis limits
     ax.set_xlim(1, 10)
@@ -47,8 +56,51 @@ def plot_results(Qs: ActionValueFunctions, num_episodes: int, lamda: float):
     ax.set_xticks(np.arange(1, 11, 1))
     ax.set_yticks(np.arange(1, 22, 1))
     # ax.set_zticks(np.arange(-1, 1, 0.5))
-    
-    savepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"vf-plot-{num_episodes}-{lamda}.png")
+
     plt.savefig(savepath)
-    plt.show()
-    
\ No newline at end of file
+    if show:
+        plt.show()
+    plt.close(fig)
+
+def plot_results(Qs: ActionValueFunctions, num_episodes: int, lamda: float, show: bool=False) -> multiprocessing.Process:
+    """
+    Plots the optimal value functions in a 3D plot.
+
+    The best value functions are saved next to the plot, and the plot is rendered
+    from them in a separate process, so this returns immediately.
+    """
+    # Extract the best action-value functions, along with the states
+    # Basically, the best value function out of the 2, corresponding to the 2 possible actions
+    name = f"vf-plot-{num_episodes}-{lamda}"
+    arraypath = os.path.join(RESULTS_DIR, f"{name}.npy")
+    np.save(arraypath, Qs.max())
+
+    title = f"Value Function - # Episodes: {num_episodes}"
+    savepath = os.path.join(RESULTS_DIR, f"{name}.png")
+    process = multiprocessing.get_context('spawn').Process(target=render_surface,
+                                                           args=(arraypath, title, savepath, show))
+    process.start()
+    return process
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Render a saved value function surface.')
+
+    parser.add_argument('array',
+                        type=str,
+                        help='Path of the saved best value functions (.npy)')
+
+    parser.add_argument('--show',
+                        action='store_true',
+                        help='Show the plot in an interactive window')
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    name = os.path.splitext(os.path.basename(args.array))[0]
+    savepath = os.path.splitext(args.array)[0] + ".png"
+    render_surface(args.array, name, savepath, args.show)
+
+if __name__ == "__main__":
+    main()
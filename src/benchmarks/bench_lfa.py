@@ -0,0 +1,28 @@
+# Standard
+import json
+# External
+# Local
+from timing import use_folder, seed, time_calls, episodes_per_sec, throughput, latency
+use_folder('lfa')
+from definitions import Deck, State
+from lfa import LFA
+from lfa_functions import FeatureVector
+
+
+def run() -> dict:
+    """Benchmarks Sarsa(lamda) with LFA and its feature vector lookup."""
+    results = {}
+
+    seed(0)
+    results['LFA.run'] = throughput(episodes_per_sec(LFA()))
+
+    seed(0)
+    FV = FeatureVector(alpha=0.01)
+    state = State(Deck.draw_first_card().value, 15)
+    results['FeatureVector.get'] = latency(time_calls(lambda: FV.get(state, 'h')))
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run()))
@@ -0,0 +1,50 @@
+# Standard
+import json
+# External
+import numpy as np
+# Local
+from timing import use_folder, seed, time_calls, episodes_per_sec, throughput, latency
+use_folder('monte-carlo')
+from definitions import Deck, Dealer, State
+from easy21 import Easy21
+from mc_functions import ActionValueFunctions
+from monte_carlo import MonteCarlo
+
+
+def run() -> dict:
+    """Benchmarks Monte Carlo control and the game engine components it uses."""
+    results = {}
+
+    seed(0)
+    results['MonteCarlo.run'] = throughput(episodes_per_sec(MonteCarlo()))
+
+    # One player step from a fresh game, hitting or sticking (dealer's turn included)
+    seed(0)
+    game = Easy21()
+    states = []
+    def start():
+        game.start()
+        states.append(game.first_state)
+    results['Easy21.step (hit)'] = latency(time_calls(lambda: game.step(states.pop(), 'h'), start))
+    results['Easy21.step (stick)'] = latency(time_calls(lambda: game.step(states.pop(), 's'), start))
+
+    # One dealer step from a fresh dealer hand
+    seed(0)
+    dealer = Dealer()
+    def deal():
+        dealer.reset()
+        dealer.start()
+    results['Dealer.step'] = latency(time_calls(dealer.step, deal))
+
+    # Greedy action lookup in a filled table
+    seed(0)
+    Qs = ActionValueFunctions()
+    Qs.avfs[:] = np.random.uniform(-1, 1, Qs.avfs.shape)
+    state = State(Deck.draw_first_card().value, 15)
+    results['ActionValueFunctions.argmax (MC)'] = latency(time_calls(lambda: Qs.argmax(state)))
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run()))
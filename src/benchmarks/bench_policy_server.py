@@ -0,0 +1,61 @@
+# Standard
+import asyncio
+import json
+import os
+import tempfile
+import time
+# External
+import numpy as np
+# Local
+from timing import use_folder, latency
+use_folder('serving')
+from policy_server import PolicyServer, measure_latency
+
+
+async def bench(num_requests: int=20000) -> dict:
+    """Benchmarks the policy server over a Unix socket, with a random Q table."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "Q.npy")
+        np.save(path, np.random.default_rng(0).uniform(-1, 1, (10, 21, 2)))
+
+        server = PolicyServer(path)
+        listener = await server.start(unix=os.path.join(tmp, "policy.sock"))
+        reader, writer = await asyncio.open_unix_connection(os.path.join(tmp, "policy.sock"))
+
+        # Pipelined single-pair requests
+        start = time.perf_counter()
+        latencies = await measure_latency(reader, writer, num_requests)
+        duration = time.perf_counter() - start
+        results['PolicyServer p50 latency'] = latency(np.percentile(latencies, 50) * 1e6)
+        results['PolicyServer p99 latency'] = latency(np.percentile(latencies, 99) * 1e6)
+        results['PolicyServer requests'] = {'value': num_requests / duration, 'unit': 'requests/s',
+                                            'higher_is_better': True}
+
+        # Batched queries, 1000 pairs per request
+        batch = ' '.join(f'{d} {p}' for d in range(1, 11) for p in range(1, 21) for _ in range(5)).encode() + b'\n'
+        start = time.perf_counter()
+        for _ in range(100):
+            writer.write(batch)
+        await writer.drain()
+        for _ in range(100):
+            await reader.readline()
+        duration = time.perf_counter() - start
+        results['PolicyServer batched queries'] = {'value': 100 * 1000 / duration, 'unit': 'queries/s',
+                                                   'higher_is_better': True}
+
+        # Let the server see the connection close before shutting it down
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.sleep(0.01)
+        server.watcher.cancel()
+        listener.close()
+        await listener.wait_closed()
+    return results
+
+def run() -> dict:
+    return asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    print(json.dumps(run()))
@@ -0,0 +1,43 @@
+# Standard
+import json
+# External
+import numpy as np
+# Local
+from timing import use_folder, seed, time_calls, episodes_per_sec, throughput, latency
+use_folder('TD-learning')
+from batch_td_learning import BatchSarsaLamda
+from definitions import Deck, State
+from td_learning import SarlsaLamda
+from td_learning_functions import ActionValueFunctions, EligibilityTraces
+
+
+def run() -> dict:
+    """Benchmarks Sarsa(lamda) and its table and trace components."""
+    results = {}
+
+    seed(0)
+    results['SarlsaLamda.run'] = throughput(episodes_per_sec(SarlsaLamda()))
+    results['BatchSarsaLamda.run'] = throughput(episodes_per_sec(BatchSarsaLamda(seed=0), 200000))
+
+    # Greedy action lookup in a filled table
+    seed(0)
+    Qs = ActionValueFunctions()
+    Qs.avfs[:] = np.random.uniform(-1, 1, Qs.avfs.shape)
+    state = State(Deck.draw_first_card().value, 15)
+    results['ActionValueFunctions.argmax (TD)'] = latency(time_calls(lambda: Qs.argmax(state)))
+
+    # Trace update in the middle of an episode, with a few traces already active
+    seed(0)
+    Es = EligibilityTraces(gamma=0.98, lamda=0.5)
+    states = [State(Deck.draw_first_card().value, p_sum) for p_sum in range(10, 14)]
+    def fill():
+        Es.reset()
+        for s in states[:-1]:
+            Es.update(s, 'h')
+    results['EligibilityTraces.update'] = latency(time_calls(lambda: Es.update(states[-1], 'h'), fill))
+
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run()))
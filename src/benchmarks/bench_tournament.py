@@ -0,0 +1,22 @@
+# Standard
+import json
+import time
+# External
+# Local
+from timing import use_folder
+use_folder('evaluation')
+from tournament import threshold_table, tournament
+
+
+def run(num_hands: int=1000000) -> dict:
+    """Benchmarks the tournament with three fixed-threshold players."""
+    tables = {f'stick at {threshold}': threshold_table(threshold) for threshold in (15, 16, 17)}
+    start = time.perf_counter()
+    tournament(tables, num_hands)
+    duration = time.perf_counter() - start
+    return {'Tournament hands': {'value': num_hands * len(tables) / duration, 'unit': 'hands/s',
+                                 'higher_is_better': True}}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run()))
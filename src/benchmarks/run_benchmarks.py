@@ -0,0 +1,106 @@
+# Standard
+import argparse
+import json
+import os
+import subprocess
+import sys
+# External
+# Local
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Every algorithm folder has its own flat modules (definitions, easy21, ...),
+# so each suite runs in its own interpreter
+SUITES = ['bench_monte_carlo', 'bench_td_learning', 'bench_lfa', 'bench_policy_server',
+          'bench_tournament']
+
+def run_suites(suites: list=SUITES) -> dict:
+    """Runs the benchmark suites and merges their results."""
+    results = {}
+    for suite in suites:
+        print(f'Running {suite}...')
+        output = subprocess.run([sys.executable, os.path.join(BENCH_DIR, f"{suite}.py")],
+                                cwd=BENCH_DIR, capture_output=True, text=True, check=True)
+        results.update(json.loads(output.stdout.strip().splitlines()[-1]))
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float=0.1) -> list:
+    """
+    Compares results against a baseline and returns the names of the benchmarks
+    that got worse by more than the threshold (a fraction of the baseline value).
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print(f'{name:<36} {result["value"]:>12.2f} {result["unit"]:<11} (no baseline)')
+            continue
+
+        base = baseline[name]['value']
+        change = (result['value'] - base) / base
+        worse = -change if result['higher_is_better'] else change
+        status = 'REGRESSION' if worse > threshold else 'ok'
+        if worse > threshold:
+            regressions.append(name)
+        print(f'{name:<36} {result["value"]:>12.2f} {result["unit"]:<11} {change:+8.1%}  {status}')
+    return regressions
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Run the benchmarks and compare them against a baseline.')
+
+    parser.add_argument('--output',
+                        type=str,
+                        help='Path of the JSON results',
+                        default=os.path.join(RESULTS_DIR, "latest.json"))
+
+    parser.add_argument('--baseline',
+                        type=str,
+                        help='Path of the JSON baseline',
+                        default=os.path.join(RESULTS_DIR, "baseline.json"))
+
+    parser.add_argument('--save-baseline',
+                        action='store_true',
+                        help='Store the results as the new baseline')
+
+    parser.add_argument('--threshold',
+                        type=float,
+                        help='Allowed slowdown before a benchmark counts as a regression',
+                        default=0.1)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    results = run_suites()
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Saved baseline to {args.baseline}')
+        return
+
+    # Without a baseline the results are only reported, and nothing is checked
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+
+    missing = [name for name in results if name not in baseline]
+    if not baseline:
+        print(f'WARNING: no baseline at {args.baseline}, so no benchmark was checked '
+              '(save one with --save-baseline on the reference machine)')
+    elif missing:
+        print(f'WARNING: {len(missing)} benchmark(s) without a baseline were not checked: {", ".join(missing)}')
+    if regressions:
+        print(f'{len(regressions)} regression(s) above {args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
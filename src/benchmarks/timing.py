@@ -0,0 +1,57 @@
+# Standard
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+import time
+# External
+import numpy as np
+# Local
+
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def use_folder(folder: str):
+    """Makes the modules of one of the algorithm folders (e.g. 'monte-carlo') importable."""
+    sys.path.insert(0, os.path.join(SRC_DIR, folder))
+
+def seed(s: int=0):
+    """Seeds every random number generator the learners use."""
+    # The card and exploration stream of the folder in use
+    from definitions import stream
+    stream.seed(s)
+    np.random.seed(s)
+
+def time_calls(call, setup=None, number: int=10000, repeat: int=5) -> float:
+    """
+    Returns the best average duration of call() in microseconds, over a few repeats.
+
+    setup() runs before every call and is not timed, for calls that change the
+    state they run on.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        total = 0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            call()
+            total += time.perf_counter() - start
+        best = min(best, total / number)
+    return best * 1e6
+
+def episodes_per_sec(learner, num_episodes: int=5000) -> float:
+    """Returns the training throughput of a learner, with its logging silenced."""
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        learner.run(num_episodes, num_iter=num_episodes + 1, plot=False)
+    return num_episodes / (time.perf_counter() - start)
+
+def throughput(value: float) -> dict:
+    """A higher-is-better result in episodes per second."""
+    return {'value': value, 'unit': 'episodes/s', 'higher_is_better': True}
+
+def latency(value: float) -> dict:
+    """A lower-is-better result in microseconds per call."""
+    return {'value': value, 'unit': 'us', 'higher_is_better': False}
@@ -0,0 +1,218 @@
+# Standard
+import argparse
+import json
+import os
+import sys
+import time
+# External
+import numpy as np
+# Local
+
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The policy server's loader of saved policies: its folder is added once, after the
+# host's own paths, so its modules don't shadow the host's modules of the same names
+SERVING_DIR = os.path.join(SRC_DIR, 'serving')
+if SERVING_DIR not in sys.path:
+    sys.path.append(SERVING_DIR)
+from policy_server import load_Q
+
+# Action encoding of the policy tables, as in easy21_batch.py
+HIT = 0
+STICK = 1
+
+def greedy_table(Q: np.ndarray) -> np.ndarray:
+    """Returns the greedy action table (10, 21) of a Q table (10, 21, 2), with ties going to hitting."""
+    return np.where(Q[..., 1] > Q[..., 0], STICK, HIT).astype(np.int8)
+
+def threshold_table(threshold: int=15) -> np.ndarray:
+    """Returns the action table (10, 21) of a player who sticks from the threshold on, like the OOP Player."""
+    table = np.full((10, 21), HIT, dtype=np.int8)
+    table[:, threshold - 1:] = STICK
+    return table
+
+def load_table(path: str, features: str='coarse') -> np.ndarray:
+    """Loads the greedy action table of a saved Q table, parameter vector or checkpoint."""
+    return greedy_table(load_Q(path, features))
+
+# Constants of the splitmix64 hash
+GOLDEN = 0x9e3779b97f4a7c15
+MIX_1 = np.uint64(0xbf58476d1ce4e5b9)
+MIX_2 = np.uint64(0x94d049bb133111eb)
+
+# Signed card of every code 0-29: red (negative) for a third of the codes
+CARDS = np.array([-(code % 10 + 1) if code < 10 else code % 10 + 1 for code in range(30)], dtype=np.int8)
+
+def mix(x: np.ndarray) -> np.ndarray:
+    """The splitmix64 finalizer, a bijective hash of 64-bit integers."""
+    x = (x ^ (x >> np.uint64(30))) * MIX_1
+    x = (x ^ (x >> np.uint64(27))) * MIX_2
+    return x ^ (x >> np.uint64(31))
+
+class Hands():
+    """
+    A shared set of Easy21 hands, numbered from start on, for every policy to play.
+
+    Every card is a hash of the seed, the hand's number and the draw: the first cards,
+    then the player's t-th hit and the dealer's t-th card. Every policy playing the
+    same hand therefore sees the same cards, so policies are compared on common random
+    numbers, and cards are only computed for the hands still playing.
+    """
+    def __init__(self, start: int, n: int, seed: int=0):
+        self.n = n
+        self.keys = mix(np.arange(start, start + n, dtype=np.uint64) + mix(np.array([seed], dtype=np.uint64)))
+        all_hands = np.arange(n)
+        self.p_first = np.abs(self.cards(all_hands, 0))
+        self.d_first = np.abs(self.cards(all_hands, 1))
+
+    def cards(self, idx: np.ndarray, draw: int) -> np.ndarray:
+        """Returns the signed cards (value 1-10, negative for red) of a draw of some hands."""
+        codes = mix(self.keys[idx] + np.uint64(draw * GOLDEN % 2 ** 64)) >> np.uint64(32)
+        return CARDS[codes % np.uint64(30)]
+
+    def player_card(self, t: int, idx: np.ndarray) -> np.ndarray:
+        """Returns the player's t-th hit of some hands."""
+        return self.cards(idx, 2 * t + 2)
+
+    def dealer_card(self, t: int, idx: np.ndarray) -> np.ndarray:
+        """Returns the dealer's t-th card after the first of some hands."""
+        return self.cards(idx, 2 * t + 3)
+
+def play(table: np.ndarray, hands: Hands) -> np.ndarray:
+    """
+    Plays every hand with a policy's action table, and returns the rewards.
+
+    The rules are those of easy21.py: the dealer keeps hitting until they bust,
+    reach 17-21, or go above the player's sum. Every turn only gathers the hands
+    still playing, by index.
+    """
+    p_sum = hands.p_first.copy()
+    rewards = np.zeros(hands.n, dtype=np.int8)
+    flat = table.ravel()
+    row = (hands.d_first.astype(np.intp) - 1) * 21 - 1 # Offset of every hand's dealer card in the table
+
+    # Player's turn: every hand still playing has hit t times
+    playing = np.arange(hands.n)
+    stuck = []
+    t = 0
+    while len(playing):
+        hit = flat[row[playing] + p_sum[playing]] == HIT
+        stuck.append(playing[~hit])
+        playing = playing[hit]
+        p_sum[playing] += hands.player_card(t, playing)
+        busted = (p_sum[playing] < 1) | (p_sum[playing] > 21)
+        rewards[playing[busted]] = -1
+        playing = playing[~busted]
+        t += 1
+    stuck = np.concatenate(stuck)
+
+    # Dealer's turn, for the hands the player stuck on
+    d_sum = hands.d_first.copy()
+    dealing = stuck[(d_sum[stuck] <= 16) & (d_sum[stuck] <= p_sum[stuck])]
+    t = 0
+    while len(dealing):
+        d_sum[dealing] += hands.dealer_card(t, dealing)
+        d = d_sum[dealing]
+        dealing = dealing[(d >= 1) & (d <= 16) & (d <= p_sum[dealing])]
+        t += 1
+    d, p = d_sum[stuck], p_sum[stuck]
+    rewards[stuck] = np.where((d < 1) | (d > 21), 1, np.sign(p - d))
+
+    return rewards
+
+def tournament(tables: dict, num_hands: int=1000000, chunk: int=1 << 20, seed: int=0) -> dict:
+    """
+    Plays num_hands common hands with every policy, in chunks of hands, and returns
+    each policy's win, draw and loss rates and mean return with a 95% confidence
+    interval. The difference of every policy's mean return to the first policy's is
+    reported too, with the paired confidence interval the common hands allow.
+    """
+    names = list(tables)
+    counts = {name: np.zeros(3, dtype=np.int64) for name in names} # Losses, draws, wins
+    diffs = {name: np.zeros(2) for name in names} # Sum and sum of squares of the paired differences
+
+    for start in range(0, num_hands, chunk):
+        hands = Hands(start, min(chunk, num_hands - start), seed)
+        base = None
+        for name in names:
+            rewards = play(tables[name], hands)
+            counts[name] += np.bincount(rewards + 1, minlength=3)
+            base = rewards if base is None else base
+            diff = rewards.astype(np.int64) - base
+            diffs[name] += [diff.sum(), np.dot(diff, diff)]
+
+    results = {}
+    for name in names:
+        loss, draw, win = counts[name] / num_hands
+        mean = win - loss
+        var = win + loss - mean ** 2
+        diff_mean = diffs[name][0] / num_hands
+        diff_var = diffs[name][1] / num_hands - diff_mean ** 2
+        results[name] = {'win': win, 'draw': draw, 'loss': loss,
+                         'mean': mean, 'ci': 1.96 * np.sqrt(var / num_hands),
+                         'diff': diff_mean, 'diff_ci': 1.96 * np.sqrt(diff_var / num_hands)}
+    return results
+
+def report(results: dict):
+    """Prints the results, best policy first."""
+    base = next(iter(results))
+    print(f'{"Policy":<40} {"Win":>7} {"Draw":>7} {"Loss":>7} {"Mean return":>18} {f"vs {base}"[:18]:>20}')
+    for name, r in sorted(results.items(), key=lambda item: -item[1]['mean']):
+        print(f'{name[:40]:<40} {r["win"]:>7.2%} {r["draw"]:>7.2%} {r["loss"]:>7.2%}'
+              f' {r["mean"]:>+9.4f} ± {r["ci"]:.4f} {r["diff"]:>+10.4f} ± {r["diff_ci"]:.4f}')
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Evaluate greedy policies on common Easy21 hands.')
+
+    # Adding a positional argument
+    parser.add_argument('policies',
+                        type=str,
+                        nargs='*',
+                        help='Paths of saved Q tables, parameter vectors or checkpoints')
+
+    parser.add_argument('--thresholds',
+                        type=int,
+                        nargs='*',
+                        help='Sums from which fixed-threshold players stick',
+                        default=[15])
+
+    parser.add_argument('--hands',
+                        type=int,
+                        help='Number of hands every policy plays',
+                        default=1000000)
+
+    parser.add_argument('--features',
+                        type=str,
+                        help='Feature engine of the parameter vectors',
+                        default='coarse')
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the hands',
+                        default=0)
+
+    parser.add_argument('--output',
+                        type=str,
+                        help='Path of a JSON file to save the results to',
+                        default=None)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    tables = {f'stick at {threshold}': threshold_table(threshold) for threshold in args.thresholds}
+    tables.update({os.path.basename(path): load_table(path, args.features) for path in args.policies})
+
+    start_time = time.time()
+    results = tournament(tables, args.hands, seed=args.seed)
+    print(f'Played {args.hands} hands with {len(tables)} policies in {time.time() - start_time:.2f} sec')
+    report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
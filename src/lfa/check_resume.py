@@ -0,0 +1,97 @@
+# Standard
+import argparse
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+import tempfile
+import time
+# External
+import numpy as np
+# Local
+from checkpoint import Checkpointer, load_checkpoint
+from definitions import stream
+from features import ENGINES
+from lfa import LFA
+
+
+def train(num_episodes: int, lamda: float, features: str, seed: int, resume: str=None,
+          checkpoint: Checkpointer=None) -> LFA:
+    """
+    Trains Sarsa(lamda) with linear function approximation and seeded cards, from
+    scratch or resumed from the checkpoint at the resume path, writing checkpoints
+    if given.
+    """
+    lfa = LFA(lamda=lamda, engine=ENGINES[features]())
+    stream.seed(seed)
+    start_episode = lfa.load_checkpoint(load_checkpoint(resume, mmap_mode='r')) if resume else 0
+    with redirect_stdout(io.StringIO()):
+        lfa.run(num_episodes, num_iter=num_episodes, plot=False, checkpoint=checkpoint,
+                start_episode=start_episode)
+    return lfa
+
+def check(num_episodes: int=20000, lamda: float=0.5, features: str='coarse', seed: int=0) -> dict:
+    """
+    Checks that a run checkpointed halfway and resumed in a new learner ends in the
+    same state as an uninterrupted run with the same seed.
+
+    The first half is written to a checkpoint in the background, as the script
+    does, and the resumed learner reads it through a memory map. Every array of
+    the final checkpoints of both runs (theta, the traces carried over from one
+    episode to the next, random stream) must be equal.
+
+    Returns whether each array is equal.
+    """
+    full = train(num_episodes, lamda, features, seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint')
+        half = num_episodes // 2
+        train(half, lamda, features, seed, checkpoint=Checkpointer(path, half))
+        resumed = train(num_episodes, lamda, features, seed, resume=path)
+
+        expected = full.get_checkpoint(num_episodes)
+        actual = resumed.get_checkpoint(num_episodes)
+        return {key: key in actual and np.array_equal(np.asarray(value), np.asarray(actual[key]))
+                for key, value in expected.items()}
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Check that a resumed Sarsa(lamda) run with linear function approximation ends like an uninterrupted one.')
+
+    parser.add_argument('--episodes',
+                        type=int,
+                        help='Number of episodes of both runs',
+                        default=20000)
+
+    parser.add_argument('--lamda',
+                        type=float,
+                        help='Eligibility trace decay rate',
+                        default=0.5)
+
+    parser.add_argument('--features',
+                        type=str,
+                        choices=list(ENGINES),
+                        help='Feature engine',
+                        default='coarse')
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the cards and exploration',
+                        default=0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    start_time = time.time()
+    results = check(args.episodes, args.lamda, args.features, args.seed)
+    print(f'Compared runs of {args.episodes} episodes in {time.time() - start_time:.2f} sec')
+    for key, equal in results.items():
+        print(f'{key:<14} {"equal" if equal else "MISMATCH"}')
+
+    if not all(results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,116 @@
 # Standard
 import argparse
+import os
+import sys
 import time
 # External
+import numpy as np
 # Local
+from checkpoint import Checkpointer, load_checkpoint, pack, unpack
+from definitions import stream
 from easy21 import Easy21
+from features import FeatureEngine, ENGINES
 from lfa_functions import EligibilityTraces, FeatureVector
-from lfa_functions import td_error, greedy_policy
+from lfa_functions import td_error, greedy_policy, behavior_prob, ACTION_IDX
+from mse_tracker import MSETracker
+from profiling import PhaseProfiler, profile_call
+from trajectories import TrajectoryWriter
 from visualization import plot_results
 
    
 class LFA():
-    def __init__(self, gamma: float=0.98, lamda: float=0.5, alpha: float=0.01):
-        self.game = Easy21()
+    def __init__(self, gamma: float=0.98, lamda: float=0.5, alpha: float=0.01, fast_dealer: bool=False,
+                 engine: FeatureEngine=None, e: float=0.05):
+        self.game = Easy21(fast_dealer)
 
         # Initialize parameters
         self.gamma = gamma # Discount factor
         self.lamda = lamda # Eligibility trace decay rate
         self.alpha = alpha # Learning rate
+        self.e = e # Exploration rate
 
         # Initialize state and state-action history
+        self.FV = FeatureVector(alpha, engine)
         self.Es = EligibilityTraces(gamma, lamda)
-        self.FV = FeatureVector(alpha)
+
+    def get_checkpoint(self, episode: int) -> dict:
+        """Returns everything needed to resume training at the given episode."""
+        return {'episode': episode,
+                'theta': self.FV.theta,
+                'E_idx': np.array(list(self.Es.Es.keys()), dtype=np.int64),
+                'E_val': np.array(list(self.Es.Es.values()), dtype=float),
+                'E_scale': self.Es.scale,
+                'stream': pack(stream.get_state())}
+
+    def load_checkpoint(self, data: dict) -> int:
+        """Restores training from a checkpoint, and returns the episode to resume at."""
+        self.FV.theta[:] = data['theta']
+        self.Es.Es = {int(k): float(e) for k, e in zip(data['E_idx'], data['E_val'])}
+        self.Es.scale = float(data['E_scale'])
+        stream.set_state(unpack(data['stream']))
+        return int(data['episode'])
+
+    def profile_targets(self) -> list:
+        """Returns the (owner, name, phase) of every method and function to time when profiling."""
+        module = sys.modules[__name__]
+        return [
+            (self.game, 'step', 'env step'),
+            (self.game.dealer, 'step', 'dealer rollout'),
+            (self.game.dealer, 'finish', 'dealer rollout'),
+            (self.FV, 'argmax', 'argmax'),
+            (module, 'greedy_policy', 'policy'),
+            (self.FV, 'get_Q', 'Q lookup'),
+            (module, 'td_error', 'TD error'),
+            (self.FV, 'get_gradQ', 'features'),
+            (self.Es, 'update', 'trace update'),
+            (self.FV, 'update', 'Q update')]
 
     def run(self, 
             num_episodes: int=1000, 
-            num_iter: int=1000):
+            num_iter: int=1000,
+            plot: bool=True,
+            Q_ref: np.ndarray=None,
+            mse_every: int=1,
+            checkpoint: Checkpointer=None,
+            start_episode: int=0,
+            profiler: PhaseProfiler=None,
+            log: TrajectoryWriter=None):
         """
         Runs TD-Learning with Sarsa(lamda).
         
         num_episodes: number of episodes to run
         num_iter: logging period (log every X number of iteratios)
+        plot: whether to plot the value function at the end
+        Q_ref: reference Q (10, 21, 2) to track the MSE against, stored in self.errors
+        mse_every: MSE sampling period (record every X number of episodes)
+        checkpoint: writes a checkpoint every checkpoint.every episodes, if given
+        start_episode: episode to start at, when resuming from a checkpoint
+        profiler: times the phases of the loop, if given
+        log: appends every episode to a trajectory log, if given
         gamma: discount factor
         """
+        # Track the MSE against the reference Q
+        self.errors = MSETracker(Q_ref, num_episodes, mse_every,
+                                  start_episode=start_episode) if Q_ref is not None else None
+
+        # Time the phases of the loop
+        if profiler is not None:
+            profiler.attach(self.profile_targets())
+
         # Simulate X number of episodes
         start_time = time.time()
         prev_time = time.time()
-        for i in range(num_episodes):
+        for i in range(start_episode, num_episodes):
             # Initial state
             self.game.start()
 
             # Randomly initialize the state and action
             state = self.game.first_state
-            action = greedy_policy(self.FV.argmax(state))
+            greedy_action = self.FV.argmax(state)
+            action = greedy_policy(greedy_action, self.e)
+            if log is not None:
+                prob = behavior_prob(greedy_action, action, self.e) # Behavior probability of the action
+                ep_states, ep_actions, ep_rewards, ep_probs = [], [], [], []
 
             # Run the game until it is over
             while not self.game.over:
@@ -49,7 +118,7 @@ class LFA():
                 greedy_action = self.FV.argmax(state)
 
                 # Decide an action based on the greedy policy
-                new_action = greedy_policy(greedy_action)
+                new_action = greedy_policy(greedy_action, self.e)
 
                 # 1 game step and get reward
                 new_state, reward = self.game.step(state, action)
@@ -65,10 +134,30 @@ class LFA():
                 # Update parameter vector
                 self.FV.update(state, action, delta, self.Es)
 
+                # Log the step, and the behavior probability of the next action
+                if log is not None:
+                    ep_states.append(state.id)
+                    ep_actions.append(ACTION_IDX[action])
+                    ep_rewards.append(reward)
+                    ep_probs.append(prob)
+                    prob = behavior_prob(greedy_action, new_action, self.e)
+
                 # Update state and action
                 state = new_state
                 action = new_action
 
+            # Log the episode
+            if log is not None:
+                log.add(ep_states, ep_actions, ep_rewards, ep_probs)
+
+            # Record the MSE against the reference Q
+            if self.errors is not None and (i + 1) % mse_every == 0:
+                self.errors.record(self.FV.get_all_Q())
+
+            # Save a checkpoint in the background
+            if checkpoint is not None and (i + 1) % checkpoint.every == 0:
+                checkpoint.save(self.get_checkpoint(i + 1))
+
             # For large runs, print out the progress intermittently
             if i % num_iter == 0:
                 elapsed_time = time.time() - start_time
@@ -77,7 +166,18 @@ class LFA():
                 print(f"\tAverage episode duration: {avg_duration:.5f}")
                 prev_time = time.time()
 
-        plot_results(self.FV, num_episodes, self.lamda)
+        if profiler is not None:
+            profiler.detach()
+        if log is not None:
+            log.flush()
+        if self.errors is not None:
+            self.errors.flush()
+            self.errors.truncate()
+        if checkpoint is not None:
+            checkpoint.wait()
+
+        if plot:
+            plot_results(self.FV, num_episodes, self.lamda)
 
 
 def main():
@@ -97,11 +197,79 @@ def main():
                         help='Eligibility trace decay rate', 
                         default=0.5)
 
+    parser.add_argument('--reference',
+                        type=str,
+                        help='Path of a reference Q (.npy) to track the MSE against',
+                        default=None)
+
+    parser.add_argument('--mse-every',
+                        type=int,
+                        help='MSE sampling period, in episodes',
+                        default=1)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the card and exploration stream',
+                        default=None)
+
+    parser.add_argument('--features',
+                        type=str,
+                        choices=list(ENGINES),
+                        help='Feature engine',
+                        default='coarse')
+
+    parser.add_argument('--fast-dealer',
+                        action='store_true',
+                        help="Sample the dealer's final sum from a precomputed distribution")
+
+    parser.add_argument('--checkpoint-every',
+                        type=int,
+                        help='Checkpoint period, in episodes (0 disables checkpoints)',
+                        default=0)
+
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Resume from the last checkpoint')
+
+    parser.add_argument('--log',
+                        type=str,
+                        help='Path of a trajectory log to append every episode to',
+                        default=None)
+
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help='Time every phase of the loop, and save the cProfile stats and a JSON summary')
+
     # Parsing the arguments
     args = parser.parse_args()
+    stream.seed(args.seed)
+    Q_ref = np.load(args.reference) if args.reference else None
+
+    lfa = LFA(lamda=args.lamda, fast_dealer=args.fast_dealer, engine=ENGINES[args.features]())
+
+    # Resume from and save checkpoints
+    checkpoint_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"checkpoint-{args.lamda}")
+    checkpoint = Checkpointer(checkpoint_path, args.checkpoint_every) if args.checkpoint_every else None
+    start_episode = lfa.load_checkpoint(load_checkpoint(checkpoint_path, mmap_mode='r')) if args.resume else 0
+
+    # Append the episodes to a trajectory log
+    log = TrajectoryWriter(args.log, 'lfa') if args.log else None
 
-    lfa = LFA(lamda=args.lamda)
-    lfa.run(args.episodes)
+    # Profile the run, saving the cProfile stats and the per-phase summary
+    profiler = PhaseProfiler() if args.profile else None
+    run = lambda: lfa.run(args.episodes, Q_ref=Q_ref, mse_every=args.mse_every, checkpoint=checkpoint,
+                          start_episode=start_episode, profiler=profiler, log=log)
+    if profiler is not None:
+        profile_call(run, profiler, os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"profile-{args.lamda}"))
+    else:
+        run()
+    if log is not None:
+        log.close()
+    if Q_ref is not None:
+        if len(lfa.errors.mse):
+            print(f"Final MSE: {lfa.errors.mse[-1]:.5f}, greedy-policy disagreement: {lfa.errors.disagreement[-1]:.3f}")
+        else:
+            print(f"No MSE recorded: no episode of the run was a multiple of --mse-every")
 
 if __name__ == "__main__":
     main()
@@ -1,95 +1,127 @@
 # Standard
-import random
 # External
 import numpy as np
 # Local
-from definitions import State, Deck, Card
+from definitions import State, NUM_STATES, stream
+from features import FeatureEngine, CoarseCoding
 
 
+# Action index along the last axis of the feature table
+ACTION_IDX = {'h': 0, 's': 1}
+
 class EligibilityTraces():
-    def __init__(self, gamma, lamda):
+    """
+    Eligibility Traces show how eligible for update every feature is. The features
+    of the most recent state-action pairs have the highest eligibility, and they
+    decay over time.
+
+    Only the non-zero traces are stored, keyed by feature index, and relative to a
+    common scale, so decaying every trace is a single multiplication and an update
+    costs O(active features of the pair) instead of O(number of features). The
+    stored traces are rescaled once the scale gets small, and the traces that have
+    decayed below the cutoff are dropped then.
+    """
+    def __init__(self, gamma, lamda, cutoff=1e-4):
         self.gamma = gamma
         self.lamda = lamda
-
-        # Parameter vector
-        self.Es = np.zeros(36)
-        
-    def update(self, gradQ):
-        """Updates the Eligibility Traces based on the weight gradient,
-        the discount factor, and the eligibility trace decay rate."""
-        self.Es = self.gamma * self.lamda * self.Es + gradQ
-
-    def get(self):
-        return self.Es
+        self.cutoff = cutoff
+        self.Es = {} # Traces divided by the scale
+        self.scale = 1.0
+
+    def update(self, gradQ: list):
+        """Decays the Eligibility Traces and adds the weight gradient, given as the
+        (feature index, weight) pairs of its active features."""
+        self.scale *= self.gamma * self.lamda
+        if self.scale < self.cutoff:
+            self.rescale()
+
+        for k, w in gradQ:
+            self.Es[k] = self.Es.get(k, 0) + w / self.scale
+
+    def rescale(self):
+        """Folds the scale into the stored traces, dropping those below the cutoff."""
+        scale = self.scale
+        self.Es = {k: scale * e for k, e in self.Es.items() if scale * e >= self.cutoff}
+        self.scale = 1.0
+
+    def get(self, k: int):
+        """Returns the Eligibility Trace of a feature."""
+        return self.scale * self.Es.get(k, 0)
         
 class FeatureVector():
-    def __init__(self, alpha):
+    def __init__(self, alpha, engine: FeatureEngine=None):
         self.alpha = alpha
 
-        # Linear Function Approximation intervals
-        self.dealer_intervals = [(1, 4), (4, 7), (7, 10)]
-        self.player_intervals = [(1, 6), (4, 9), (7, 12), (10, 15), (13, 18), (16, 21)]
+        # Linear Function Approximation features, coarse coding by default
+        self.engine = engine if engine is not None else CoarseCoding()
         self.actions = ['h', 's']
 
-        # Parameter vector
-        self.theta = np.zeros(len(self.dealer_intervals)
-                              * len(self.player_intervals)
-                              * len(self.actions))
-        
-    def get(self, s: State, a: str):
-        """Generate the feature vector for a given state and action"""
-        dealer_card = s.d_first_card.value
-        player_sum = s.p_sum
-
-        feature = np.zeros((len(self.dealer_intervals), 
-                            len(self.player_intervals),
-                            len(self.actions)))
-        
-        for i, (d_start, d_end) in enumerate(self.dealer_intervals):
-            for j, (p_start, p_end) in enumerate(self.player_intervals):
-                for k, act in enumerate(self.actions):
-                    if d_start <= dealer_card <= d_end and p_start <= player_sum <= p_end and a == act:
-                        feature[i, j, k] = 1
+        # Parameter vector, and a view of it for the step loop: indexing the view reads
+        # and writes plain floats in theta's memory, without numpy's per-item overhead
+        self.theta = np.zeros(self.engine.num_features)
+        self.theta_view = memoryview(self.theta)
+
+        # Sparse feature matrix of every (state id, action), computed once:
+        # the indices of the active features and their weights (0 for padding).
+        # The terminal state has no active features
+        self.idx, self.w = self.engine.index_matrix()
+
+        # The same, as (feature index, weight) pairs, for the step loop
+        self.active = [[[(int(k), float(w)) for k, w in zip(self.idx[s_id, a_idx], self.w[s_id, a_idx]) if w]
+                        for a_idx in range(len(self.actions))]
+                       for s_id in range(NUM_STATES + 1)]
 
-        return feature.flatten()
+        # Preallocated buffer for the Q table
+        self.Qs = np.zeros((10, 21, len(self.actions)))
+
+    def get(self, s: State, a: str) -> list:
+        """Returns the precomputed active features of a state and action, as (feature index, weight) pairs."""
+        return self.active[s.id][ACTION_IDX[a]]
     
     def get_Q(self, s: State, a: str):
         """Returns the Action Value Function for a specific state-action pair."""
-        phi = self.get(s, a)
-        return np.dot(phi, self.theta)
-    
-    def get_gradQ(self, s: State, a: str):
-        """Returns the gradient of the Action Value Function for a specific state-action pair."""
-        phi = self.get(s, a)
+        theta = self.theta_view
+        return sum([theta[k] * w for k, w in self.get(s, a)])
+
+    def Q(self, s_ids: np.ndarray) -> np.ndarray:
+        """Returns the Action Value Functions of both actions of an array of state ids, shape (n, 2)."""
+        return np.sum(self.theta[self.idx[s_ids]] * self.w[s_ids], axis=-1)
+
+    def get_all_Q(self) -> np.ndarray:
+        """Returns the Action Value Functions of every state-action pair, shape (10, 21, 2),
+        as one gather of theta through the sparse feature matrix. The result is written
+        into a preallocated buffer, which is reused by the next call."""
+        Q = self.theta[self.idx[:NUM_STATES]] * self.w[:NUM_STATES]
+        return np.sum(Q.reshape(10, 21, len(self.actions), -1), axis=3, out=self.Qs)
+
+    def dense(self, s_ids: np.ndarray, a_idx: np.ndarray) -> np.ndarray:
+        """Returns the dense feature vectors of arrays of state ids and action indices, shape (n, num_features)."""
+        idx, w = self.idx[s_ids, a_idx], self.w[s_ids, a_idx]
+        phi = np.zeros((len(idx), len(self.theta)))
+        np.add.at(phi, (np.repeat(np.arange(len(idx)), idx.shape[1]), idx.reshape(-1)), w.reshape(-1))
         return phi
+    
+    def get_gradQ(self, s: State, a: str) -> list:
+        """Returns the gradient of the Action Value Function for a specific state-action pair,
+        as the (feature index, weight) pairs of its active features."""
+        return self.get(s, a)
             
     def update(self, s: State, a: str, delta: float, Es: EligibilityTraces):
-        """Update the weight vector based on the td error, the eligibility traces,
-        and the feature vector for this specific state-action pair."""
-        self.theta = self.theta + self.alpha * delta * Es.get() * self.get(s, a)
+        """Update the weight vector in place based on the td error, the eligibility traces,
+        and the feature vector for this specific state-action pair, touching only its
+        active features."""
+        theta = self.theta_view
+        step = self.alpha * delta
+        traces, scale = Es.Es, Es.scale # Es.get, inlined
+        for k, w in self.get(s, a):
+            theta[k] += scale * traces.get(k, 0) * w * step
       
     def argmax(self, s: State) -> str:
         """Returns the Action that maximizes Q in the current state"""
-        # Get the AVFs
-        Q_values = [self.get_Q(s, action) for action in self.actions]
-
-        # Finding the action that maximizes the Q value
-        greedy_action = self.actions[np.argmax(Q_values)]
-        
-        return greedy_action
-
-    @staticmethod
-    def find_interval_indices(value: int, intervals: list):
-        """Finds the index of the interval a value fits in, given a list of intervals."""
-        return [index for index, interval in enumerate(intervals) if interval[0] <= value <= interval[1]]
-
-    @staticmethod
-    def cardID2card(card_id: str):
-        """Convert the card ID to a card."""
-        card = Card()
-        card.value = int(card_id[1])
-        card.color = card_id[0]
-        return card
+        # Ties go to hitting, as the first action
+        theta = self.theta_view
+        q_h, q_s = [sum([theta[k] * w for k, w in active]) for active in self.active[s.id]]
+        return 'h' if q_h >= q_s else 's'
 
     def max(self) -> np.ndarray:
         """
@@ -97,28 +129,12 @@ class FeatureVector():
         
         Basically, picks the highest Q out of the 2 possible actions for every state.
         """
-        # Calculate the AVF for all possible states
-        deck = Deck()
-        avfs = {(d_first_card_id, p_sum, action): 
-                    self.get_Q(State(self.cardID2card(d_first_card_id), p_sum), action)
-                for d_first_card_id in deck.all_cards
-                for p_sum in range(1, 22)
-                for action in ['h', 's']}
-        
-        # Initialize a 3D NumPy array
-        q_values_array = np.zeros((10, 21, 2)) # 10 21 2
-
-        # Populate the 4D array
-        for (d_first_card_id, p_sum, action), q_value in avfs.items():
-            card_index = int(str(d_first_card_id)[1:]) - 1  # Convert card 'b1'...'b10' to 0...9
-            p_sum_index = p_sum - 1  # Convert p_sum 1...21 to 0...20
-            action_index = 0 if action == 'h' else 1  # Convert action 'h'/'s' to 0/1
-            q_values_array[card_index, p_sum_index, action_index] = q_value
+        # Q of every (dealer card, player sum, action) as one gather
+        q_values_array = self.get_all_Q() # 10 21 2
 
         # Find the best action for each (d_first_card_id, p_sum) pair
         best_actions_q_values = np.max(q_values_array, axis=2) # 10 21
 
-        # All_q_values now contains your original q_values plus the best q_values in the last slice of the third dimension
         return best_actions_q_values
     
 def greedy_policy(a_star, e=0.05):
@@ -133,7 +149,12 @@ def greedy_policy(a_star, e=0.05):
 
     explore_action = 's' if a_star == 'h' else 'h'
         
-    return a_star if random.random() < prob else explore_action
+    return a_star if stream.uniform() < prob else explore_action
+
+def behavior_prob(a_star, a, e=0.05):
+    """Returns the probability greedy_policy had of choosing the action a."""
+    prob = e / 2 + 1 - e
+    return prob if a == a_star else 1 - prob
 
 def td_error(reward, Q, Q_next, gamma):
     delta = reward + gamma*Q_next - Q
@@ -0,0 +1,234 @@
+# Standard
+import argparse
+import time
+# External
+import numpy as np
+# Local
+from dealer_sampler import dealer_distribution
+from definitions import Deck, NUM_STATES, TERMINAL, stream
+from easy21 import Easy21
+from features import FeatureEngine, ENGINES
+from lfa_functions import FeatureVector, ACTION_IDX
+from trajectories import TrajectoryReader
+from visualization import plot_results
+
+
+class LSTDQ():
+    """
+    Least-squares evaluation of Q for the linear features of a FeatureVector.
+
+    Accumulates A = sum phi(s, a) (phi(s, a) - gamma phi(s', a'))' and
+    b = sum phi(s, a) r over batches of (s, a, r, s', a') transitions, and solves
+    A theta = b for the parameter vector directly. The terminal state has no
+    active features, so it is worth 0.
+    """
+    def __init__(self, FV: FeatureVector, gamma: float=1.0, reg: float=1e-6):
+        self.FV = FV
+        self.gamma = gamma
+        self.reg = reg # Ridge term, for features no transition reached
+        self.reset()
+
+    def reset(self):
+        n = len(self.FV.theta)
+        self.A = np.zeros((n, n))
+        self.b = np.zeros(n)
+
+    def add(self, s: np.ndarray, a: np.ndarray, r: np.ndarray, s_next: np.ndarray, a_next: np.ndarray):
+        """
+        Adds a batch of transitions, as arrays of state ids, action indices and rewards.
+        Only the active features of every transition are scattered into A and b.
+        """
+        idx, w = self.FV.idx[s, a], self.FV.w[s, a] # n k
+        idx_next, w_next = self.FV.idx[s_next, a_next], self.FV.w[s_next, a_next]
+        cols = np.concatenate([idx, idx_next], axis=1) # n 2k
+        diff = np.concatenate([w, -self.gamma * w_next], axis=1)
+        np.add.at(self.A, (idx[:, :, None], cols[:, None, :]), w[:, :, None] * diff[:, None, :])
+        np.add.at(self.b, idx, w * r[:, None])
+
+    def solve(self) -> np.ndarray:
+        """Returns the parameter vector solving the accumulated system."""
+        return np.linalg.solve(self.A + self.reg * np.eye(len(self.b)), self.b)
+
+class LSPI():
+    """
+    Least-squares policy iteration for the linear function approximator.
+
+    Every iteration evaluates the greedy policy of the current parameter vector with
+    LSTD-Q, over a fixed set of transitions or over the exact model of the game, and
+    stops once the greedy policy no longer changes.
+    """
+    def __init__(self, gamma: float=1.0, reg: float=1e-6, max_iter: int=50, engine: FeatureEngine=None):
+        self.gamma = gamma # Discount factor
+        self.max_iter = max_iter
+        self.FV = FeatureVector(alpha=0, engine=engine)
+        self.lstdq = LSTDQ(self.FV, gamma, reg)
+
+    def greedy(self, s: np.ndarray) -> np.ndarray:
+        """Returns the greedy action indices of an array of state ids, with ties going to hitting."""
+        Q = self.FV.Q(s) # n 2
+        return (Q[:, 1] > Q[:, 0]).astype(np.int64)
+
+    def policy(self) -> np.ndarray:
+        """Returns the greedy action index of every state id."""
+        return self.greedy(np.arange(NUM_STATES))
+
+    def iterate(self, evaluate) -> int:
+        """Runs policy iteration with an evaluation step, and returns the number of iterations."""
+        policy = self.policy()
+        for i in range(1, self.max_iter + 1):
+            self.lstdq.reset()
+            evaluate()
+            self.FV.theta[:] = self.lstdq.solve()
+
+            new_policy = self.policy()
+            changed = np.count_nonzero(new_policy != policy)
+            print(f'Iteration {i}: {changed} greedy actions changed')
+            if not changed:
+                break
+            policy = new_policy
+        return i
+
+    def run(self, samples: tuple) -> int:
+        """
+        Runs LSPI over a fixed set of (s, a, r, s') transitions, as arrays of state ids,
+        action indices and rewards, with s' TERMINAL at the end of an episode.
+        """
+        s, a, r, s_next = samples
+        return self.iterate(lambda: self.lstdq.add(s, a, r, s_next, self.greedy(s_next)))
+
+    def run_model(self) -> int:
+        """
+        Runs LSPI over the exact model of the game, with every state-action pair
+        weighted equally.
+        """
+        R_stick, T_hit, bust = model()
+        s = np.arange(NUM_STATES)
+        hit = np.zeros(NUM_STATES, dtype=np.int64)
+        stick = np.ones(NUM_STATES, dtype=np.int64)
+
+        def evaluate():
+            # Sticking ends the game with its expected reward
+            terminal = np.full(NUM_STATES, TERMINAL)
+            self.lstdq.add(s, stick, R_stick, terminal, stick)
+
+            # Hitting leads to the expected features of the next state under the policy
+            phi = self.FV.dense(s, hit)
+            phi_next = T_hit @ self.FV.dense(s, self.policy())
+            self.lstdq.A += phi.T @ (phi - self.gamma * phi_next)
+            self.lstdq.b += phi.T @ -bust
+
+        return self.iterate(evaluate)
+
+def model():
+    """
+    Returns the exact model of the game over state ids: the expected reward of
+    sticking (210,), the transition matrix between states when hitting (210, 210),
+    and the probability of busting when hitting (210,).
+    """
+    # Reward of every (player sum, dealer outcome): a dealer bust is a win
+    P = dealer_distribution() # 10 21 22
+    rewards = np.sign(np.arange(1, 22)[:, None] - np.arange(22)[None, :])
+    rewards[:, 0] = 1
+    R_stick = np.einsum('dpk,pk->dp', P, rewards).reshape(NUM_STATES)
+
+    # Hitting changes the player sum, and keeps the dealer's first card
+    T_hit = np.zeros((NUM_STATES, NUM_STATES))
+    bust = np.zeros(NUM_STATES)
+    for card, prob in Deck.card_distribution().items():
+        for d_idx in range(10):
+            for p_idx in range(21):
+                new_p = p_idx + 1 + card
+                if 1 <= new_p <= 21:
+                    T_hit[d_idx * 21 + p_idx, d_idx * 21 + new_p - 1] += prob
+                else:
+                    bust[d_idx * 21 + p_idx] += prob
+    return R_stick, T_hit, bust
+
+def collect_samples(num_episodes: int, fast_dealer: bool=True) -> tuple:
+    """
+    Plays episodes with a uniformly random policy and returns their transitions
+    (s, a, r, s') as arrays. Only the end of a game is rewarded.
+    """
+    game = Easy21(fast_dealer)
+    s, a, r, s_next = [], [], [], []
+    for _ in range(num_episodes):
+        game.start()
+        state = game.first_state
+        while not game.over:
+            action = 'h' if stream.uniform() < 0.5 else 's'
+            new_state, reward = game.step(state, action)
+            s.append(state.id)
+            a.append(ACTION_IDX[action])
+            r.append(reward if game.over else 0)
+            s_next.append(TERMINAL if game.over else new_state.id)
+            state = new_state
+    return np.array(s), np.array(a), np.array(r, dtype=float), np.array(s_next)
+
+def log_samples(log: TrajectoryReader) -> tuple:
+    """
+    Returns the transitions (s, a, r, s') of every episode of a trajectory log.
+    As in collect_samples, only the end of a game is rewarded: the TD and LFA
+    runners log a reward on every step, which is dropped before the last one.
+    """
+    records = log.records
+    s = records['state'].astype(np.int64)
+    s_next = np.append(s[1:], TERMINAL)
+    s_next[log.bounds[1:] - 1] = TERMINAL # Episodes end in the terminal state
+    r = np.where(s_next == TERMINAL, records['reward'], 0).astype(float)
+    return s, records['action'].astype(np.int64), r, s_next
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Solve for the linear function approximator with LSPI.')
+
+    # Adding a positional argument
+    parser.add_argument('episodes',
+                        type=int,
+                        nargs='?',
+                        help='Number of random-policy episodes to collect',
+                        default=5000)
+
+    parser.add_argument('--model',
+                        action='store_true',
+                        help='Evaluate policies with the exact model instead of sampled episodes')
+
+    parser.add_argument('--log',
+                        type=str,
+                        help='Path of a trajectory log to take the transitions from, instead of new episodes',
+                        default=None)
+
+    parser.add_argument('--gamma',
+                        type=float,
+                        help='Discount factor',
+                        default=1.0)
+
+    parser.add_argument('--features',
+                        type=str,
+                        choices=list(ENGINES),
+                        help='Feature engine',
+                        default='coarse')
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the card and exploration stream',
+                        default=None)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+    stream.seed(args.seed)
+
+    lspi = LSPI(gamma=args.gamma, engine=ENGINES[args.features]())
+    start_time = time.time()
+    if args.model:
+        lspi.run_model()
+    elif args.log:
+        lspi.run(log_samples(TrajectoryReader(args.log)))
+    else:
+        lspi.run(collect_samples(args.episodes))
+    print(f'Solved in {time.time() - start_time:.2f} sec')
+
+    plot_results(lspi.FV, 'model' if args.model else args.episodes, 'lspi')
+
+if __name__ == "__main__":
+    main()
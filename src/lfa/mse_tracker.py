@@ -0,0 +1,54 @@
+# Standard
+# External
+import numpy as np
+# Local
+
+
+class MSETracker():
+    """
+    Records the mean squared error of Q against a reference Q, and the fraction of
+    states where their greedy actions disagree, every few episodes of training.
+
+    Recording only copies Q into a preallocated block of snapshots; the errors of a
+    full block are then computed at once, so tracking costs little per episode.
+    """
+    def __init__(self, Q_ref: np.ndarray, num_episodes: int, every: int=1, block: int=1024,
+                 start_episode: int=0):
+        self.Q_ref = Q_ref.reshape(-1) # Flat, actions interleaved
+        self.policy_ref = self.Q_ref[1::2] > self.Q_ref[0::2] # Sticks, ties go to hitting
+        self.every = every
+
+        # Preallocated records, one per sample after the episode training starts at
+        self.episodes = np.arange((start_episode // every + 1) * every, num_episodes + 1, every)
+        self.mse = np.zeros(len(self.episodes))
+        self.disagreement = np.zeros(len(self.episodes))
+        self.n = 0
+
+        # Block of Q snapshots waiting to be evaluated
+        self.snapshots = np.zeros((block,) + Q_ref.shape)
+        self.j = 0
+
+    def record(self, Q: np.ndarray):
+        """Records a snapshot of Q (10, 21, 2)."""
+        self.snapshots[self.j] = Q
+        self.j += 1
+        if self.j == len(self.snapshots):
+            self.flush()
+
+    def flush(self):
+        """Computes the MSE and greedy-policy disagreement of the recorded snapshots."""
+        if self.j == 0:
+            return
+        Qs = self.snapshots[:self.j].reshape(self.j, -1)
+        diff = Qs - self.Q_ref
+        self.mse[self.n:self.n + self.j] = np.einsum('ij,ij->i', diff, diff) / diff.shape[1]
+        policy = Qs[:, 1::2] > Qs[:, 0::2]
+        self.disagreement[self.n:self.n + self.j] = np.mean(policy != self.policy_ref, axis=1)
+        self.n += self.j
+        self.j = 0
+
+    def truncate(self):
+        """Drops the records past the last one recorded, when training stopped early."""
+        self.episodes = self.episodes[:self.n]
+        self.mse = self.mse[:self.n]
+        self.disagreement = self.disagreement[:self.n]
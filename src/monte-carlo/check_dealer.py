@@ -0,0 +1,130 @@
+# Standard
+import argparse
+import sys
+import time
+# External
+import numpy as np
+# Local
+from dealer_sampler import DealerSampler, dealer_distribution
+from definitions import State, stream
+from dp_solver import stick_rewards
+from easy21 import Easy21
+
+
+def alias_error() -> float:
+    """Returns the largest error of the distributions the alias tables encode, against the exact ones."""
+    sampler = DealerSampler()
+    P = dealer_distribution().reshape(-1, sampler.outcomes)
+    prob = np.array(sampler.prob).reshape(P.shape)
+    alias = np.array(sampler.alias).reshape(P.shape)
+
+    # An outcome keeps its own column's prob, and the rest of every column aliased to it
+    encoded = prob.copy()
+    for i in range(len(P)):
+        np.add.at(encoded[i], alias[i], 1 - prob[i])
+    return float(np.max(np.abs(encoded / sampler.outcomes - P)))
+
+def chi_square_z(observed: np.ndarray, expected: np.ndarray) -> float:
+    """
+    Returns the chi-square statistic of the outcome counts of every state (rows)
+    against their expected counts, summed over the states and normalized to a
+    z-score. The outcomes expected fewer than 5 times in a state are pooled.
+    """
+    chi2, df = 0.0, 0
+    for O, E in zip(observed, expected):
+        small = E < 5
+        O = np.append(O[~small], O[small].sum())
+        E = np.append(E[~small], E[small].sum())
+        kept = E > 0
+        chi2 += np.sum((O[kept] - E[kept]) ** 2 / E[kept])
+        df += np.count_nonzero(kept) - 1
+    return (chi2 - df) / np.sqrt(2 * df)
+
+def play_sticks(d_first: np.ndarray, p_sum: np.ndarray, fast_dealer: bool, seed: int=0) -> tuple:
+    """Sticks on every (dealer first card, player sum), and returns the rewards and dealer outcomes (0 for a bust)."""
+    stream.seed(seed)
+    game = Easy21(fast_dealer=fast_dealer)
+    rewards = np.zeros(len(d_first), dtype=np.int64)
+    outcomes = np.zeros(len(d_first), dtype=np.int64)
+    for i, (d, p) in enumerate(zip(d_first.tolist(), p_sum.tolist())):
+        game.start()
+        game.dealer.sum = d
+        game.player.sum = p
+        _, rewards[i] = game.step(State(d, p), 's')
+        outcomes[i] = 0 if game.dealer.busted else game.dealer.sum
+    return rewards, outcomes
+
+def check(num_sticks: int=200000, seed: int=0, max_z: float=4.0) -> dict:
+    """
+    Checks that the fast dealer has the outcome statistics of the step-by-step dealer.
+
+    Both dealers play the same num_sticks random states, and each is tested against
+    the exact distribution of dealer_distribution: the mean reward with a z-test,
+    and the final sums (bust, 1-21) of every state with a chi-square test,
+    normalized to a z-score. Both pass within max_z standard deviations.
+
+    Returns the z-scores and verdicts of both dealers.
+    """
+    rng = np.random.default_rng(seed)
+    d_first = rng.integers(1, 11, size=num_sticks)
+    p_sum = rng.integers(1, 22, size=num_sticks)
+    s_ids = (d_first - 1) * 21 + (p_sum - 1)
+
+    # Exact mean and variance of the reward, and expected counts of the final sums of every state
+    P_all = dealer_distribution().reshape(-1, 22)
+    P = P_all[s_ids]
+    mean = stick_rewards().reshape(-1)[s_ids]
+    p_win = P[:, 0] + np.array([P[i, 1:p].sum() for i, p in enumerate(p_sum)])
+    p_loss = np.array([P[i, p + 1:].sum() for i, p in enumerate(p_sum)])
+    var = p_win + p_loss - mean ** 2
+    expected = np.bincount(s_ids, minlength=len(P_all))[:, None] * P_all
+
+    results = {}
+    for name, fast_dealer in [('step-by-step', False), ('fast', True)]:
+        rewards, outcomes = play_sticks(d_first, p_sum, fast_dealer, seed)
+        reward_z = (rewards.sum() - mean.sum()) / np.sqrt(var.sum())
+        observed = np.zeros(expected.shape)
+        np.add.at(observed, (s_ids, outcomes), 1)
+        chi2_z = chi_square_z(observed, expected)
+        results[name] = {'reward_z': reward_z, 'chi2_z': chi2_z,
+                         'ok': bool(abs(reward_z) < max_z and chi2_z < max_z)}
+    return results
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description="Check the fast dealer's outcome statistics against the step-by-step dealer's.")
+
+    parser.add_argument('--sticks',
+                        type=int,
+                        help='Number of random states stuck on with each dealer',
+                        default=200000)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the states and cards',
+                        default=0)
+
+    parser.add_argument('--max-z',
+                        type=float,
+                        help='Largest z-score of the tests that passes',
+                        default=4.0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    error = alias_error()
+    print(f'Alias tables: largest error {error:.2e} against the exact distributions')
+
+    start_time = time.time()
+    results = check(args.sticks, args.seed, args.max_z)
+    print(f'Played {args.sticks} sticks with each dealer in {time.time() - start_time:.2f} sec')
+    for name, r in results.items():
+        print(f'{name:<14} mean reward z {r["reward_z"]:+6.2f}, final sums chi-square z {r["chi2_z"]:+6.2f}  '
+              f'{"ok" if r["ok"] else "MISMATCH"}')
+
+    if error > 1e-12 or not all(r['ok'] for r in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Standard
+import argparse
+from contextlib import redirect_stdout
+import io
+import os
+import sys
+import tempfile
+import time
+# External
+import numpy as np
+# Local
+from checkpoint import Checkpointer, load_checkpoint
+from definitions import stream
+from early_stopping import EarlyStopping
+from monte_carlo import MonteCarlo
+
+
+def train(num_episodes: int, first_visit: bool, seed: int, resume: str=None,
+          checkpoint: Checkpointer=None) -> tuple:
+    """
+    Trains Monte Carlo control with seeded cards and early-stopping checks, from
+    scratch or resumed from the checkpoint at the resume path, writing checkpoints
+    if given.
+
+    Returns the learner and its checks.
+    """
+    MC = MonteCarlo(first_visit=first_visit)
+    stopping = EarlyStopping(every=1000, tol=0.0) # Checked, but never settled
+    stream.seed(seed)
+    start_episode = MC.load_checkpoint(load_checkpoint(resume, mmap_mode='r'), stopping) if resume else 0
+    with redirect_stdout(io.StringIO()):
+        MC.run(num_episodes, num_iter=num_episodes, plot=False, checkpoint=checkpoint,
+               start_episode=start_episode, stopping=stopping)
+    return MC, stopping
+
+def check(num_episodes: int=20000, first_visit: bool=True, seed: int=0) -> dict:
+    """
+    Checks that a run checkpointed halfway and resumed in a new learner ends in the
+    same state as an uninterrupted run with the same seed.
+
+    The first half is written to a checkpoint in the background, as the script
+    does, and the resumed learner reads it through a memory map. Every array of
+    the final checkpoints of both runs (counts, Q, random stream, early-stopping
+    checks) must be equal.
+
+    Returns whether each array is equal.
+    """
+    full, full_stopping = train(num_episodes, first_visit, seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint')
+        half = num_episodes // 2
+        train(half, first_visit, seed, checkpoint=Checkpointer(path, half))
+        resumed, resumed_stopping = train(num_episodes, first_visit, seed, resume=path)
+
+        expected = full.get_checkpoint(num_episodes, full_stopping)
+        actual = resumed.get_checkpoint(num_episodes, resumed_stopping)
+        return {key: key in actual and np.array_equal(np.asarray(value), np.asarray(actual[key]))
+                for key, value in expected.items()}
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Check that a resumed Monte Carlo run ends like an uninterrupted one.')
+
+    parser.add_argument('--episodes',
+                        type=int,
+                        help='Number of episodes of both runs',
+                        default=20000)
+
+    parser.add_argument('--every-visit',
+                        action='store_true',
+                        help='Use every-visit Monte Carlo control (default: first-visit)')
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the cards and exploration',
+                        default=0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    start_time = time.time()
+    results = check(args.episodes, not args.every_visit, args.seed)
+    print(f'Compared runs of {args.episodes} episodes in {time.time() - start_time:.2f} sec')
+    for key, equal in results.items():
+        print(f'{key:<14} {"equal" if equal else "MISMATCH"}')
+
+    if not all(results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
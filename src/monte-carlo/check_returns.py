@@ -0,0 +1,85 @@
+# Standard
+import argparse
+import sys
+import time
+# External
+import numpy as np
+# Local
+from definitions import State
+from mc_functions import episode_returns, ACTION_IDX
+
+
+def naive_returns(states: list, actions: list, rewards: list, first_visit: bool=True) -> list:
+    """Computes the returns of the visits of an episode forward, summing the rest of the rewards at every step."""
+    visits = []
+    seen = set()
+    for t in range(len(states)):
+        idx = (states[t].id, ACTION_IDX[actions[t]])
+        if first_visit and idx in seen:
+            continue
+        seen.add(idx)
+        visits.append((idx, sum(rewards[t:])))
+    return visits
+
+def random_episode(rng: np.random.Generator, max_length: int=20, num_states: int=4) -> tuple:
+    """
+    Returns a random episode, drawn from a few states so that state-action pairs
+    are often visited more than once, with a reward of -1, 0 or 1 on every step.
+    """
+    length = int(rng.integers(1, max_length + 1))
+    ids = rng.integers(0, num_states, size=length)
+    states = [State(int(s) // 21 + 1, int(s) % 21 + 1) for s in ids]
+    actions = ['h' if a == 0 else 's' for a in rng.integers(0, 2, size=length)]
+    rewards = rng.integers(-1, 2, size=length).tolist()
+    return states, actions, rewards
+
+def check(num_episodes: int=10000, seed: int=0) -> dict:
+    """
+    Checks the single-pass backward returns of episode_returns against the forward
+    sums of naive_returns, on the same seeded random episodes, for first-visit and
+    every-visit MC. The visits are compared in any order.
+
+    Returns the number of mismatching episodes for each.
+    """
+    rng = np.random.default_rng(seed)
+    episodes = [random_episode(rng) for _ in range(num_episodes)]
+
+    results = {}
+    for name, first_visit in [('first-visit', True), ('every-visit', False)]:
+        mismatches = 0
+        for states, actions, rewards in episodes:
+            fast = sorted(episode_returns(states, actions, rewards, first_visit))
+            naive = sorted(naive_returns(states, actions, rewards, first_visit))
+            mismatches += fast != naive
+        results[name] = mismatches
+    return results
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Check the backward Monte Carlo returns against forward sums.')
+
+    parser.add_argument('--episodes',
+                        type=int,
+                        help='Number of random episodes',
+                        default=10000)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the episodes',
+                        default=0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    start_time = time.time()
+    results = check(args.episodes, args.seed)
+    print(f'Checked {args.episodes} episodes in {time.time() - start_time:.2f} sec')
+    for name, mismatches in results.items():
+        print(f'{name:<12} {mismatches} mismatching episode(s)  {"ok" if mismatches == 0 else "MISMATCH"}')
+
+    if any(results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
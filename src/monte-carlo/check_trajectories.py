@@ -0,0 +1,113 @@
+# Standard
+import argparse
+import os
+import sys
+import tempfile
+import time
+# External
+import numpy as np
+# Local
+from trajectories import HEADER_SIZE, RECORD, TrajectoryReader, TrajectoryWriter
+
+
+def random_episodes(rng: np.random.Generator, num_episodes: int, max_length: int=12) -> list:
+    """Returns random episodes, as the state ids, action indices, rewards and behavior probabilities of their steps."""
+    episodes = []
+    for _ in range(num_episodes):
+        length = int(rng.integers(1, max_length + 1))
+        episodes.append((rng.integers(0, 210, size=length).tolist(),
+                         rng.integers(0, 2, size=length).tolist(),
+                         rng.integers(-1, 2, size=length).tolist(),
+                         rng.random(length).astype(np.float32).tolist()))
+    return episodes
+
+def same_episode(records: np.ndarray, episode: tuple) -> bool:
+    """Returns whether the records of a logged episode hold the steps of an episode."""
+    states, actions, rewards, probs = episode
+    return (records['state'].tolist() == states and records['action'].tolist() == actions
+            and records['reward'].tolist() == rewards and records['prob'].tolist() == probs)
+
+def check(num_episodes: int=5000, sessions: int=3, chunk: int=1000, seed: int=0) -> dict:
+    """
+    Checks that episodes written to a trajectory log read back unchanged.
+
+    The episodes are written over several writer sessions appending to the same
+    file, with a chunk small enough to split every session into several writes. A
+    partial record is left at the end of the file before every new session, as an
+    interrupted write would leave it. The log must then hold every episode, with
+    consecutive ids, in file order and in a shuffled order of batches, and refuse
+    a writer of another runner.
+
+    Returns the verdict of every check.
+    """
+    rng = np.random.default_rng(seed)
+    episodes = random_episodes(rng, num_episodes)
+    splits = np.array_split(np.arange(num_episodes), sessions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.bin')
+        ids = []
+        for k, split in enumerate(splits):
+            if k > 0:
+                with open(path, 'ab') as f:
+                    f.write(b'\xff' * (RECORD.itemsize // 2))
+            with TrajectoryWriter(path, 'mc', chunk) as log:
+                ids.extend(log.add(*episodes[i]) for i in split)
+
+        log = TrajectoryReader(path)
+        results = {'size': os.path.getsize(path) == HEADER_SIZE + len(log.records) * RECORD.itemsize,
+                   'episode ids': ids == list(range(num_episodes)) and len(log) == num_episodes
+                                  and all(int(log[i]['episode'][0]) == i for i in range(len(log))),
+                   'file order': len(log) == num_episodes
+                                 and all(same_episode(log[i], episodes[i]) for i in range(num_episodes))}
+
+        # Shuffled batches gather the same episodes
+        order = rng.permutation(num_episodes)
+        batched = ([records[a:b] for records, offsets in log.batches(256, order)
+                    for a, b in zip(offsets[:-1], offsets[1:])] if len(log) == num_episodes else [])
+        results['shuffled batches'] = (len(batched) == num_episodes
+                                       and all(same_episode(r, episodes[i]) for r, i in zip(batched, order)))
+
+        # A log is only appended to by the runner that wrote it
+        try:
+            TrajectoryWriter(path, 'td').close()
+            results['runner'] = False
+        except ValueError:
+            results['runner'] = True
+        del log
+    return results
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Check that trajectory logs read back the episodes written to them.')
+
+    parser.add_argument('--episodes',
+                        type=int,
+                        help='Number of random episodes',
+                        default=5000)
+
+    parser.add_argument('--sessions',
+                        type=int,
+                        help='Number of writer sessions appending to the log',
+                        default=3)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the episodes',
+                        default=0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    start_time = time.time()
+    results = check(args.episodes, args.sessions, seed=args.seed)
+    print(f'Checked {args.episodes} episodes over {args.sessions} sessions in {time.time() - start_time:.2f} sec')
+    for name, ok in results.items():
+        print(f'{name:<17} {"ok" if ok else "MISMATCH"}')
+
+    if not all(results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Standard
+import json
+import os
+import shutil
+import threading
+# External
+import numpy as np
+# Local
+
+
+class Checkpointer():
+    """
+    Writes training checkpoints in a background thread, as directories holding one
+    raw .npy file per array, so every array of a checkpoint can be memory-mapped.
+
+    The arrays are copied when a checkpoint is taken, so training can keep going
+    while the previous snapshot is written. Checkpoints are written to a temporary
+    directory and swapped in, so a complete checkpoint is always on disk.
+    """
+    def __init__(self, path: str, every: int=10000):
+        self.path = path
+        self.every = every # Episodes between checkpoints
+        self.thread = None
+
+    def save(self, arrays: dict):
+        """Snapshots the arrays and writes them to disk in the background."""
+        snapshot = {k: np.array(v, copy=True) for k, v in arrays.items()}
+        self.wait()
+        self.thread = threading.Thread(target=self.write, args=(snapshot,))
+        self.thread.start()
+
+    def write(self, snapshot: dict):
+        tmp_path, old_path = self.path + '.tmp', self.path + '.old'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, array in snapshot.items():
+            np.save(os.path.join(tmp_path, name + '.npy'), array)
+
+        # A directory can't be replaced by a rename: the previous checkpoint is moved
+        # aside first, and load_checkpoint falls back to it until the new one is in
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.isdir(self.path):
+            os.replace(self.path, old_path)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def wait(self):
+        """Waits for the checkpoint being written, if any."""
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+def load_checkpoint(path: str, mmap_mode: str=None) -> dict:
+    """
+    Loads all the arrays of a checkpoint, memory-mapped with mmap_mode if given
+    (see np.load). Checkpoints saved as npz files are read whole.
+    """
+    if not os.path.exists(path) and os.path.isdir(path + '.old'):
+        path += '.old' # Stopped while swapping in the next checkpoint
+    if os.path.isfile(path):
+        with np.load(path) as data:
+            return {k: data[k] for k in data.files}
+    return {name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+            for name in os.listdir(path) if name.endswith('.npy')}
+
+def pack(state: dict) -> np.ndarray:
+    """Packs a JSON-serializable state (e.g. the random stream's) into an array."""
+    return np.array(json.dumps(state))
+
+def unpack(array: np.ndarray) -> dict:
+    """Unpacks a state packed with pack."""
+    return json.loads(str(array))
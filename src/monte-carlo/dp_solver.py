@@ -0,0 +1,112 @@
+# Standard
+import argparse
+import hashlib
+import json
+import os
+import time
+# External
+import numpy as np
+# Local
+from dealer_sampler import dealer_distribution
+from definitions import DEALER_STICK, Deck
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def card_transitions():
+    """Returns the signed card values of a draw and their probabilities."""
+    distribution = Deck.card_distribution()
+    return np.array(list(distribution.keys())), np.array(list(distribution.values()))
+
+def stick_rewards(dealer_stick: int=DEALER_STICK) -> np.ndarray:
+    """Returns the expected reward of sticking, for every dealer first card and player sum."""
+    P = dealer_distribution(dealer_stick)
+
+    # Reward of every (player sum, dealer outcome): a dealer bust is a win
+    p_sums = np.arange(1, 22)[:, None]
+    d_sums = np.arange(22)[None, :]
+    rewards = np.sign(p_sums - d_sums)
+    rewards[:, 0] = 1
+
+    return np.einsum('dpk,pk->dp', P, rewards)
+
+def hit_transitions():
+    """
+    Returns the player's hit transition matrix between sums 1-21, shape (21, 21),
+    and the probability of busting from every sum, shape (21,).
+    """
+    cards, probs = card_transitions()
+    T = np.zeros((21, 21))
+    bust = np.zeros(21)
+    for p_idx in range(21):
+        for card, prob in zip(cards, probs):
+            new_p = p_idx + 1 + card
+            if new_p < 1 or new_p > 21:
+                bust[p_idx] += prob
+            else:
+                T[p_idx, new_p - 1] += prob
+    return T, bust
+
+def value_iteration(gamma: float=1.0, dealer_stick: int=DEALER_STICK, tol: float=1e-12, max_iter: int=10000) -> np.ndarray:
+    """
+    Computes Q* of every (dealer first card, player sum, action) with value iteration.
+
+    Returns an array of shape (10, 21, 2), where action 0 is hit and 1 is stick.
+    """
+    Q_stick = stick_rewards(dealer_stick) # 10 21
+    T, bust = hit_transitions() # 21 21, 21
+
+    V = Q_stick.copy()
+    for _ in range(max_iter):
+        Q_hit = gamma * (V @ T.T) - bust
+        new_V = np.maximum(Q_hit, Q_stick)
+        if np.max(np.abs(new_V - V)) < tol:
+            V = new_V
+            break
+        V = new_V
+
+    Q_hit = gamma * (V @ T.T) - bust
+    return np.stack([Q_hit, Q_stick], axis=2)
+
+def rules_key(gamma: float, dealer_stick: int) -> str:
+    """Returns a short hash identifying the rules Q* was solved for."""
+    rules = {'gamma': gamma,
+             'dealer_stick': dealer_stick,
+             'cards': sorted(Deck.card_distribution().items())}
+    return hashlib.sha1(json.dumps(rules).encode()).hexdigest()[:12]
+
+def solve(gamma: float=1.0, dealer_stick: int=DEALER_STICK, use_cache: bool=True) -> np.ndarray:
+    """Returns Q* as a (10, 21, 2) array, loading it from the on-disk cache when available."""
+    savepath = os.path.join(CACHE_DIR, f"qstar-{rules_key(gamma, dealer_stick)}.npy")
+    if use_cache and os.path.exists(savepath):
+        return np.load(savepath)
+
+    Q = value_iteration(gamma, dealer_stick)
+    if use_cache:
+        np.save(savepath, Q)
+    return Q
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Solve Easy21 exactly with dynamic programming.')
+
+    parser.add_argument('--gamma',
+                        type=float,
+                        help='Discount factor',
+                        default=1.0)
+
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='Recompute Q* instead of loading it from disk')
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    start_time = time.time()
+    Q = solve(args.gamma, use_cache=not args.no_cache)
+    print(f'Solved Q* in {time.time() - start_time:.4f} sec')
+    print(f'V*: mean {Q.max(axis=2).mean():.4f}, max {Q.max():.4f}, min {Q.min():.4f}')
+
+if __name__ == "__main__":
+    main()
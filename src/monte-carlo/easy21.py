@@ -2,20 +2,24 @@
 from typing import Tuple, Literal
 # External
 # Local
+from dealer_sampler import DealerSampler
 from definitions import Deck, State
 from definitions import Player, Dealer, Gambler
 
 
 class Easy21():
-    def __init__(self):
+    def __init__(self, fast_dealer: bool=False):
         self.deck = Deck()
         self.player = Player()
         self.dealer = Dealer()
         self.turn: Literal['p', 'd'] = None
 
+        # Sample the dealer's final sum in one draw instead of playing it out
+        self.dealer_sampler = DealerSampler() if fast_dealer else None
+
     @property
     def first_state(self) -> State:
-        return State(self.dealer.cards[0], self.player.cards[0].value)
+        return State(self.dealer.cards[0].value, self.player.cards[0].value)
 
     @property
     def over(self) -> bool:
@@ -40,10 +44,14 @@ class Easy21():
     def step(self, s, a):
         new_state = self.player.step(s, a)
         if a == 's':
-            while not self.over:
-                self.dealer.step()
+            if self.dealer_sampler:
+                self.dealer.finish(self.dealer_sampler.sample(new_state.id))
+            else:
+                while not self.over:
+                    self.dealer.step()
 
-        reward = self.decide_reward()
+        # Only the end of the game is rewarded
+        reward = self.decide_reward() if self.over else 0
         
         return new_state, reward
 
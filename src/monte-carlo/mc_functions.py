@@ -1,97 +1,114 @@
 # Standard
-import random
 # External
 import numpy as np
 # Local
-from definitions import State, Deck
+from definitions import State, NUM_STATES, stream
 
 
+# Action index along the last axis of the tables
+ACTION_IDX = {'h': 0, 's': 1}
+
 class StateHistory():
     """Stores state visits."""
     def __init__(self):
-        deck = Deck()
-        self.state_counts = {(card_id, p_sum): 0
-                             for card_id in deck.all_cards
-                             for p_sum in range(1, 22)}
+        # Dealer card 1-10 x player sum 1-21
+        self.state_counts = np.zeros((10, 21), dtype=np.int64)
+        self.counts = self.state_counts.reshape(NUM_STATES) # Indexed by state id
 
     def add(self, s: State):
         """Increases the count of a state's visits."""
-        self.state_counts[s.to_key()] += 1
+        self.counts[s.id] += 1
 
     def get(self, s: State):
         """Returns the number of visits of a specific state."""
-        return self.state_counts[s.to_key()]
+        return self.counts[s.id]
+
+    def add_batch(self, visits: list):
+        """Increases the state visit counts of a batch of (index, return) visits."""
+        for idx, _ in visits:
+            self.counts[idx[0]] += 1
 
 class StateActionHistory():
     """Stores visits of state-action pairs."""
     def __init__(self):
-        deck = Deck()
-        self.state_counts = {(d_first_card_id, p_sum, action): 0
-                             for d_first_card_id in deck.all_cards
-                             for p_sum in range(1, 22)
-                             for action in ['h', 's']}
+        # Dealer card 1-10 x player sum 1-21 x action h/s
+        self.state_counts = np.zeros((10, 21, 2), dtype=np.int64)
+        self.counts = self.state_counts.reshape(NUM_STATES, 2) # Indexed by state id, action
         
     def add(self, s: State, a: str):
         """Increases the visit count of a State-Action pair."""
-        self.state_counts[(str(s.d_first_card), s.p_sum, a)] += 1
+        self.counts[s.id, ACTION_IDX[a]] += 1
         
     def get(self, s: State, a: str):
         """Returns the visit count of a State-Action pair."""
-        return self.state_counts[(str(s.d_first_card), s.p_sum, a)]
+        return self.counts[s.id, ACTION_IDX[a]]
         
 class ActionValueFunctions():
     def __init__(self):
-        deck = Deck()
-        self.avfs = {(d_first_card_id, p_sum, action): 0
-                     for d_first_card_id in deck.all_cards
-                     for p_sum in range(1, 22)
-                     for action in ['h', 's']}
+        # Dealer card 1-10 x player sum 1-21 x action h/s
+        self.avfs = np.zeros((10, 21, 2))
+        self.Q = self.avfs.reshape(NUM_STATES, 2) # Indexed by state id, action
+        self.best_avfs = np.zeros((10, 21))
         
     def update(self, s: State, a: str, G: int, N: int):
         """Increases the AVF value based on the episode score G and the count of
         the current state-action pairs N."""
-        Q = self.avfs[(str(s.d_first_card), s.p_sum, a)]
-        Q = Q + (1/N) * (G - Q)
-        self.avfs[(str(s.d_first_card), s.p_sum, a)] = Q
+        idx = (s.id, ACTION_IDX[a])
+        Q = self.Q[idx]
+        self.Q[idx] = Q + (1/N) * (G - Q)
         
+    def update_batch(self, visits: list, H_sa: StateActionHistory):
+        """
+        Adds a batch of (index, return) visits to the state-action counts, and moves
+        the AVF values towards their returns G one visit at a time, so the values stay
+        the running average of the returns.
+        """
+        counts = H_sa.counts
+        for idx, G in visits:
+            counts[idx] += 1
+            Q = self.Q[idx]
+            self.Q[idx] = Q + (G - Q) / counts[idx]
+
     def get(self, s: State, a: str):
         """Returns the Action Value Function Q(s, a)"""
-        return self.avfs[(str(s.d_first_card), s.p_sum, a)]
+        return self.Q[s.id, ACTION_IDX[a]]
     
     def argmax(self, s: State) -> str:
         """Returns the Action that maximizes Q in the current state"""
-        # Extracting the sub-dictionary for the current state
-        state_avfs = {action: q_value 
-                    for (d_first_card_id, p_sum, action), q_value in self.avfs.items()
-                    if d_first_card_id == str(s.d_first_card) and p_sum == s.p_sum}
-        
-        # Finding the action that maximizes the Q value
-        greedy_action = max(state_avfs, key=state_avfs.get)
-        
-        return greedy_action
+        # Ties go to hitting, as the first action
+        q_h, q_s = self.Q[s.id]
+        return 'h' if q_h >= q_s else 's'
     
-    def max(self) -> str:
+    def max(self) -> np.ndarray:
         """
         Returns the best Action Value Functions for every state.
         
         Basically, picks the highest Q out of the 2 possible actions for every state.
+        The result is written into a preallocated (10, 21) buffer, which is reused
+        by the next call.
         """
-        # Initialize a 3D NumPy array
-        q_values_array = np.zeros((10, 21, 2)) # 10 21 2
+        return np.max(self.avfs, axis=2, out=self.best_avfs)
+    
+def episode_returns(states: list, actions: list, rewards: list, first_visit: bool=True):
+    """
+    Computes the (undiscounted) return of the visits of an episode in one backward pass.
 
-        # Populate the 4D array
-        for (d_first_card_id, p_sum, action), q_value in self.avfs.items():
-            card_index = int(str(d_first_card_id)[1:]) - 1  # Convert card 'b1'...'b10' to 0...9
-            p_sum_index = p_sum - 1  # Convert p_sum 1...21 to 0...20
-            action_index = 0 if action == 'h' else 1  # Convert action 'h'/'s' to 0/1
-            q_values_array[card_index, p_sum_index, action_index] = q_value
+    With first_visit, a state-action pair seen again earlier in the episode replaces
+    its later visit, so only its first visit is kept. Returns the visits as
+    ((state id, action) index, return) pairs.
+    """
+    G = 0
+    visits = {} if first_visit else []
+    for t in range(len(states) - 1, -1, -1):
+        G += rewards[t]
+        idx = (states[t].id, ACTION_IDX[actions[t]])
+        if first_visit:
+            visits[idx] = G
+        else:
+            visits.append((idx, G))
 
-        # Find the best action for each (d_first_card_id, p_sum) pair
-        best_actions_q_values = np.max(q_values_array, axis=2) # 10 21
+    return list(visits.items()) if first_visit else visits
 
-        # All_q_values now contains your original q_values plus the best q_values in the last slice of the third dimension
-        return best_actions_q_values
-    
 def greedy_policy(N_s, a_star, N0=100):
     """
     e-Greedy Exploration implementation, where N_s is the number of
@@ -105,4 +122,10 @@ def greedy_policy(N_s, a_star, N0=100):
 
     explore_action = 's' if a_star == 'h' else 'h'
         
-    return a_star if random.random() < prob else explore_action
+    return a_star if stream.uniform() < prob else explore_action
+
+def behavior_prob(N_s, a_star, a, N0=100):
+    """Returns the probability greedy_policy had of choosing the action a."""
+    e = N0 / (N0 + N_s)
+    prob = e / 2 + 1 - e
+    return prob if a == a_star else 1 - prob
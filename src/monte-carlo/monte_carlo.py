@@ -1,25 +1,41 @@
 # Standard
 import argparse
+import os
+import sys
 import time
 # External
+import numpy as np
 from numpy import mean
 # Local
+from checkpoint import Checkpointer, load_checkpoint, pack, unpack
+from definitions import stream
 from easy21 import Easy21
+from early_stopping import EarlyStopping, add_stopping_arguments, stopping_config
 from mc_functions import StateHistory, StateActionHistory, ActionValueFunctions, greedy_policy
+from mc_functions import episode_returns, behavior_prob, ACTION_IDX
+from mse_tracker import MSETracker
+from profiling import PhaseProfiler, profile_call
+from trajectories import TrajectoryWriter
 from visualization import plot_results
 
    
 class MonteCarlo():
-    def __init__(self):
-        self.game = Easy21()
+    def __init__(self, first_visit: bool=True, fast_dealer: bool=False, N0: float=100):
+        self.game = Easy21(fast_dealer)
+        self.first_visit = first_visit # First-visit or every-visit MC
+        self.N0 = N0 # Exploration constant
 
         # Initialize state and state-action history
         self.H_s = StateHistory()
         self.H_sa = StateActionHistory()
         self.Qs = ActionValueFunctions()
 
-    def simulate_episode(self):
-        """Simulates a full Easy21 episode."""
+    def simulate_episode(self, probs: list=None):
+        """
+        Simulates a full Easy21 episode.
+
+        probs: if given, the behavior probability of every action is appended to it
+        """
         states = []
         actions = []
         rewards = []
@@ -38,7 +54,9 @@ class MonteCarlo():
                 greedy_action = self.Qs.argmax(state)
 
                 # Decide an action based on the greedy policy
-                action = greedy_policy(state_count, greedy_action)
+                action = greedy_policy(state_count, greedy_action, self.N0)
+                if probs is not None:
+                    probs.append(behavior_prob(state_count, greedy_action, action, self.N0))
 
                 # Save the states, actions
                 states.append(state)
@@ -52,30 +70,106 @@ class MonteCarlo():
         # print(f"Player {self.game.player.sum} vs. Dealer {self.game.dealer.sum}")
         return states, actions, rewards
 
-    def run(self, num_episodes: int=1000, num_iter: int=1000):
+    def update(self, states: list, actions: list, rewards: list):
+        """Updates the visit counts and action value functions from one episode."""
+        # Returns of the (first) visits of every state-action pair
+        visits = episode_returns(states, actions, rewards, self.first_visit)
+
+        # Update the state counts, then the state-action counts and action value functions
+        self.H_s.add_batch(visits)
+        self.Qs.update_batch(visits, self.H_sa)
+
+    def get_checkpoint(self, episode: int, stopping: EarlyStopping=None) -> dict:
+        """Returns everything needed to resume training, and the early-stopping checks if given, at the given episode."""
+        return {'episode': episode,
+                'N_s': self.H_s.state_counts,
+                'N_sa': self.H_sa.state_counts,
+                'Q': self.Qs.avfs,
+                'stream': pack(stream.get_state()),
+                **(stopping.get_checkpoint() if stopping is not None else {})}
+
+    def load_checkpoint(self, data: dict, stopping: EarlyStopping=None) -> int:
+        """Restores training, and the early-stopping checks if given, from a checkpoint, and returns the episode to resume at."""
+        if stopping is not None:
+            stopping.load_checkpoint(data)
+        self.H_s.state_counts[:] = data['N_s']
+        self.H_sa.state_counts[:] = data['N_sa']
+        self.Qs.avfs[:] = data['Q']
+        stream.set_state(unpack(data['stream']))
+        return int(data['episode'])
+
+    def profile_targets(self) -> list:
+        """Returns the (owner, name, phase) of every method and function to time when profiling."""
+        module = sys.modules[__name__]
+        return [
+            (self.game, 'step', 'env step'),
+            (self.game.dealer, 'step', 'dealer rollout'),
+            (self.game.dealer, 'finish', 'dealer rollout'),
+            (self.Qs, 'argmax', 'argmax'),
+            (module, 'greedy_policy', 'policy'),
+            (module, 'episode_returns', 'returns'),
+            (self.H_s, 'add_batch', 'count update'),
+            (self.Qs, 'update_batch', 'Q update')]
+
+    def run(self, num_episodes: int=1000, num_iter: int=1000, plot: bool=True,
+            Q_ref: np.ndarray=None, mse_every: int=1,
+            checkpoint: Checkpointer=None, start_episode: int=0,
+            profiler: PhaseProfiler=None, log: TrajectoryWriter=None, stopping: EarlyStopping=None):
+        """
+        Runs Monte Carlo control.
+
+        num_episodes: number of episodes to run
+        num_iter: logging period (log every X number of iteratios)
+        plot: whether to plot the value function at the end
+        Q_ref: reference Q (10, 21, 2) to track the MSE against, stored in self.errors
+        mse_every: MSE sampling period (record every X number of episodes)
+        checkpoint: writes a checkpoint every checkpoint.every episodes, if given
+        start_episode: episode to start at, when resuming from a checkpoint
+        profiler: times the phases of the loop, if given
+        log: appends every episode to a trajectory log, if given
+        stopping: stops once Q has settled, if given
+        """
+        # Track the MSE against the reference Q
+        self.errors = MSETracker(Q_ref, num_episodes, mse_every,
+                                  start_episode=start_episode) if Q_ref is not None else None
+
+        # Time the phases of the loop
+        if profiler is not None:
+            profiler.attach(self.profile_targets())
+
         # Simulate X number of episodes
         start_time = time.time()
         prev_time = time.time()
         episode_lengths = []
-        for i in range(num_episodes):
+        for i in range(start_episode, num_episodes):
             # Run episode
-            states, actions, rewards = self.simulate_episode()
+            probs = [] if log is not None else None
+            states, actions, rewards = self.simulate_episode(probs)
             episode_lengths.append(len(actions))
 
-            # Iterate over every state and action in he episode
-            for state, action in zip(states, actions):
-                # The reward of the first occurange of the state-action pair
-                first_occurrence_idx = next(i for i,x in enumerate(zip(states, actions)) 
-                                            if x[0] == state and x[1] == action)
-                G = rewards[first_occurrence_idx]
-                
-                # Update state (s_counts, policies) and state-action (sa_counts, rewards) counts
-                self.H_s.add(state)
-                self.H_sa.add(state, action)
-
-                # Update the action value functions
-                N = self.H_sa.get(state, action)
-                self.Qs.update(state, action, G, N)
+            # Log the episode
+            if log is not None:
+                log.add([s.id for s in states], [ACTION_IDX[a] for a in actions], rewards, probs)
+
+            # Learn from the episode
+            self.update(states, actions, rewards)
+
+            # Record the MSE against the reference Q
+            if self.errors is not None and (i + 1) % mse_every == 0:
+                self.errors.record(self.Qs.avfs)
+
+            # Check whether Q has settled, before the checkpoint saves the state of the checks
+            settled = stopping is not None and (i + 1) % stopping.every == 0 and stopping.check(self.Qs.avfs)
+
+            # Save a checkpoint in the background
+            if checkpoint is not None and (i + 1) % checkpoint.every == 0:
+                checkpoint.save(self.get_checkpoint(i + 1, stopping))
+
+            # Stop once Q has settled
+            if settled:
+                print(f'Q settled, stopping after {i + 1} episodes')
+                stopping.stopped_at = num_episodes = i + 1
+                break
 
             # For large runs, print out the progress intermittently
             if i % num_iter == 0:
@@ -87,7 +181,18 @@ class MonteCarlo():
                       f"\t\tlength: {mean(episode_lengths)}")
                 prev_time = time.time()
 
-        plot_results(self.Qs, num_episodes)
+        if profiler is not None:
+            profiler.detach()
+        if log is not None:
+            log.flush()
+        if self.errors is not None:
+            self.errors.flush()
+            self.errors.truncate()
+        if checkpoint is not None:
+            checkpoint.wait()
+
+        if plot:
+            plot_results(self.Qs, num_episodes)
 
 
 def main():
@@ -101,11 +206,84 @@ def main():
                         help='Number of episodes to run', 
                         default=1000)
 
+    parser.add_argument('--reference',
+                        type=str,
+                        help='Path of a reference Q (.npy) to track the MSE against',
+                        default=None)
+
+    parser.add_argument('--mse-every',
+                        type=int,
+                        help='MSE sampling period, in episodes',
+                        default=1)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the card and exploration stream',
+                        default=None)
+
+    parser.add_argument('--fast-dealer',
+                        action='store_true',
+                        help="Sample the dealer's final sum from a precomputed distribution")
+
+    parser.add_argument('--every-visit',
+                        action='store_true',
+                        help='Average the returns of every visit instead of first visits only')
+
+    parser.add_argument('--checkpoint-every',
+                        type=int,
+                        help='Checkpoint period, in episodes (0 disables checkpoints)',
+                        default=0)
+
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Resume from the last checkpoint')
+
+    parser.add_argument('--log',
+                        type=str,
+                        help='Path of a trajectory log to append every episode to',
+                        default=None)
+
+    # Early-stopping options, shared with the other scripts
+    add_stopping_arguments(parser)
+
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help='Time every phase of the loop, and save the cProfile stats and a JSON summary')
+
     # Parsing the arguments
     args = parser.parse_args()
+    stream.seed(args.seed)
+    Q_ref = np.load(args.reference) if args.reference else None
+
+    MC = MonteCarlo(first_visit=not args.every_visit, fast_dealer=args.fast_dealer)
+
+    # Stop once Q has settled
+    config = stopping_config(args)
+    stopping = EarlyStopping(**config) if config else None
+
+    # Resume from and save checkpoints, along with the state of the early-stopping checks
+    checkpoint_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "checkpoint-mc")
+    checkpoint = Checkpointer(checkpoint_path, args.checkpoint_every) if args.checkpoint_every else None
+    start_episode = MC.load_checkpoint(load_checkpoint(checkpoint_path, mmap_mode='r'), stopping) if args.resume else 0
+
+    # Append the episodes to a trajectory log
+    log = TrajectoryWriter(args.log, 'mc') if args.log else None
 
-    MC = MonteCarlo()
-    MC.run(args.episodes)
+    # Profile the run, saving the cProfile stats and the per-phase summary
+    profiler = PhaseProfiler() if args.profile else None
+    run = lambda: MC.run(args.episodes, Q_ref=Q_ref, mse_every=args.mse_every, checkpoint=checkpoint,
+                         start_episode=start_episode, profiler=profiler, log=log, stopping=stopping)
+    if profiler is not None:
+        profile_call(run, profiler, os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "profile-mc"))
+    else:
+        run()
+    if log is not None:
+        log.close()
+    if Q_ref is not None:
+        if len(MC.errors.mse):
+            print(f"Final MSE: {MC.errors.mse[-1]:.5f}, greedy-policy disagreement: {MC.errors.disagreement[-1]:.3f}")
+        else:
+            print(f"No MSE recorded: no episode of the run was a multiple of --mse-every")
 
 if __name__ == "__main__":
     main()
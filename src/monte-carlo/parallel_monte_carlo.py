@@ -0,0 +1,134 @@
+# Standard
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import time
+# External
+import numpy as np
+# Local
+from definitions import stream
+from monte_carlo import MonteCarlo
+from visualization import plot_results
+
+
+def run_shard(task: dict) -> tuple:
+    """
+    Runs a shard of GLIE episodes in a worker process, starting from the merged
+    tables broadcast by the coordinator.
+
+    Returns the increments of the state counts, the state-action counts and the
+    sums of returns (Q * N) collected during the shard.
+    """
+    stream.seed(task['seed'])
+
+    # Start from the merged tables
+    MC = MonteCarlo()
+    MC.H_s.state_counts[:] = task['N_s']
+    MC.H_sa.state_counts[:] = task['N_sa']
+    MC.Qs.avfs[:] = task['Q']
+
+    for _ in range(task['episodes']):
+        states, actions, rewards = MC.simulate_episode()
+        MC.update(states, actions, rewards)
+
+    dN_s = MC.H_s.state_counts - task['N_s']
+    dN_sa = MC.H_sa.state_counts - task['N_sa']
+    dG = MC.Qs.avfs * MC.H_sa.state_counts - task['Q'] * task['N_sa']
+    return dN_s, dN_sa, dG
+
+class ParallelMonteCarlo():
+    """
+    Monte Carlo control spread over a pool of worker processes.
+
+    Every round, each worker runs a shard of episodes with its own RNG stream, and
+    the coordinator merges their returns by visit count, so the merged Q is the
+    average return over all the workers' visits. The merged tables, and so the
+    greedy policy, are then broadcast back for the next round.
+    """
+    def __init__(self, num_workers: int=4, sync_every: int=10000, seed: int=0):
+        self.num_workers = num_workers
+        self.sync_every = sync_every # Episodes per worker between merges
+        self.seed_seq = np.random.SeedSequence(seed)
+
+        # Merged tables
+        self.N_s = np.zeros((10, 21), dtype=np.int64)
+        self.N_sa = np.zeros((10, 21, 2), dtype=np.int64)
+        self.G = np.zeros((10, 21, 2)) # Sums of returns
+        self.MC = MonteCarlo()
+
+    @property
+    def Qs(self):
+        """The merged Action Value Functions."""
+        return self.MC.Qs
+
+    def merge(self, shards: list):
+        """Merges the workers' increments, weighting the returns by visit count."""
+        for dN_s, dN_sa, dG in shards:
+            self.N_s += dN_s
+            self.N_sa += dN_sa
+            self.G += dG
+
+        np.divide(self.G, self.N_sa, out=self.MC.Qs.avfs, where=self.N_sa > 0)
+        self.MC.H_s.state_counts[:] = self.N_s
+        self.MC.H_sa.state_counts[:] = self.N_sa
+
+    def run(self, num_episodes: int=1000, plot: bool=True):
+        start_time = time.time()
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            done = 0
+            while done < num_episodes:
+                # Split the round between the workers
+                round_episodes = min(self.sync_every * self.num_workers, num_episodes - done)
+                shard_sizes = [len(shard) for shard in np.array_split(np.arange(round_episodes), self.num_workers)]
+                seeds = self.seed_seq.spawn(self.num_workers)
+                tasks = [{'seed': int(ss.generate_state(1)[0]),
+                          'episodes': size,
+                          'N_s': self.N_s,
+                          'N_sa': self.N_sa,
+                          'Q': self.MC.Qs.avfs}
+                         for ss, size in zip(seeds, shard_sizes) if size > 0]
+
+                # Run the shards and merge them
+                self.merge(executor.map(run_shard, tasks))
+                done += round_episodes
+
+                elapsed_time = time.time() - start_time
+                print(f'Processed {done} episodes in {elapsed_time:.2f} sec...')
+
+        if plot:
+            plot_results(self.MC.Qs, num_episodes)
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Run the Monte Carlo simulation on multiple processes.')
+
+    # Adding a positional argument
+    parser.add_argument('episodes',
+                        type=int,
+                        nargs='?',
+                        help='Number of episodes to run',
+                        default=1000)
+
+    parser.add_argument('--workers',
+                        type=int,
+                        help='Number of worker processes',
+                        default=4)
+
+    parser.add_argument('--sync-every',
+                        type=int,
+                        help='Episodes each worker runs between merges',
+                        default=10000)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Base seed the worker RNG streams are spawned from',
+                        default=0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    MC = ParallelMonteCarlo(args.workers, args.sync_every, args.seed)
+    MC.run(args.episodes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Standard
+import argparse
+import time
+# External
+import numpy as np
+# Local
+from monte_carlo import MonteCarlo
+from trajectories import TrajectoryReader, to_episodes
+from visualization import plot_results
+
+
+def replay(MC: MonteCarlo, log: TrajectoryReader, passes: int=1, shuffle: bool=False,
+           batch_size: int=4096, seed: int=None):
+    """
+    Trains Monte Carlo control offline, from the episodes of a trajectory log.
+
+    Every pass runs the MC update over all the logged episodes, read in batches of
+    batch_size episodes, in file order or in a new random order per pass. The
+    episodes were generated by the logging policy, so Q averages the returns of that
+    behavior policy.
+
+    Returns are the sum of an episode's logged rewards, so only logs of the MC runner,
+    which rewards the end of a game alone, can be replayed.
+    """
+    if log.runner != 'mc':
+        raise ValueError(f"Can only replay logs of the mc runner, not {log.runner}: "
+                         "the TD and LFA runners log a reward on every step")
+
+    rng = np.random.default_rng(seed)
+    start_time = time.time()
+    for i in range(passes):
+        order = rng.permutation(len(log)) if shuffle else None
+        for records, offsets in log.batches(batch_size, order):
+            for states, actions, rewards in to_episodes(records, offsets):
+                MC.update(states, actions, rewards)
+
+        elapsed_time = time.time() - start_time
+        print(f'Replayed pass {i + 1}/{passes} of {len(log)} episodes in {elapsed_time:.2f} sec...')
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Train Monte Carlo control offline from a trajectory log.')
+
+    # Adding a positional argument
+    parser.add_argument('log',
+                        type=str,
+                        help='Path of the trajectory log')
+
+    parser.add_argument('--passes',
+                        type=int,
+                        help='Number of passes over the log',
+                        default=1)
+
+    parser.add_argument('--shuffle',
+                        action='store_true',
+                        help='Replay the episodes in a new random order every pass')
+
+    parser.add_argument('--batch-size',
+                        type=int,
+                        help='Number of episodes read at once',
+                        default=4096)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the episode order',
+                        default=None)
+
+    parser.add_argument('--every-visit',
+                        action='store_true',
+                        help='Average the returns of every visit instead of first visits only')
+
+    # Parsing the arguments
+    args = parser.parse_args()
+
+    log = TrajectoryReader(args.log)
+    MC = MonteCarlo(first_visit=not args.every_visit)
+    replay(MC, log, args.passes, args.shuffle, args.batch_size, args.seed)
+    plot_results(MC.Qs, len(log) * args.passes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# Standard
+import argparse
+import asyncio
+import os
+import sys
+import time
+# External
+import numpy as np
+# Local
+
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The lfa folder's flat modules, for theta_to_Q: added once, after the host's own
+# paths, so they don't shadow the host's modules of the same names
+LFA_DIR = os.path.join(SRC_DIR, 'lfa')
+if LFA_DIR not in sys.path:
+    sys.path.append(LFA_DIR)
+
+def theta_to_Q(theta: np.ndarray, features: str='coarse') -> np.ndarray:
+    """Returns the Q table (10, 21, 2) of an LFA parameter vector, with the lfa folder's features."""
+    from features import ENGINES
+    from lfa_functions import FeatureVector
+
+    FV = FeatureVector(alpha=0, engine=ENGINES[features]())
+    FV.theta[:] = theta
+    return FV.get_all_Q().copy()
+
+def load_Q(path: str, features: str='coarse') -> np.ndarray:
+    """
+    Loads a Q table (10, 21, 2) from a saved array: a Q table or an LFA parameter
+    vector (.npy), or a checkpoint holding either (a directory, or an .npz file).
+    """
+    if os.path.isdir(path):
+        name = 'Q.npy' if os.path.exists(os.path.join(path, 'Q.npy')) else 'theta.npy'
+        array = np.load(os.path.join(path, name), mmap_mode='r')
+    elif path.endswith('.npz'):
+        with np.load(path) as data:
+            array = data['Q'] if 'Q' in data.files else data['theta']
+    else:
+        array = np.load(path)
+
+    if array.shape == (10, 21, 2):
+        return array
+    if array.ndim == 1:
+        return theta_to_Q(array, features)
+    raise ValueError(f"{path} holds neither a (10, 21, 2) Q table nor a parameter vector")
+
+class PolicyServer():
+    """
+    Answers greedy "hit or stick" queries for (dealer card, player sum) pairs.
+
+    The protocol is line based: a request is a line of one or more space separated
+    "dealer_card player_sum" pairs, and its response is a line with one action
+    ('h' or 's') per pair, or '?' for a pair outside the table. Clients may send
+    many requests without waiting; responses come back in order.
+
+    The greedy actions are kept in a read-only table indexed by dealer card and
+    player sum, which is swapped for a new one whenever the source file changes.
+    """
+    def __init__(self, path: str, features: str='coarse', poll: float=1.0):
+        self.path = path
+        self.features = features
+        self.poll = poll # Seconds between checks of the source file
+        self.load()
+
+    def load(self):
+        """Loads the source file, and replaces the table of greedy actions."""
+        mtime = os.stat(self.path).st_mtime_ns
+        Q = load_Q(self.path, self.features)
+
+        # Indexed by dealer card * 22 + player sum, '?' outside the table
+        table = np.full((11, 22), ord('?'), dtype=np.uint8)
+        table[1:, 1:] = np.where(Q[..., 1] > Q[..., 0], ord('s'), ord('h')) # Ties go to hitting
+        table.setflags(write=False)
+
+        self.table = table
+        self.actions = table.tobytes()
+        self.mtime = mtime
+
+    async def watch(self):
+        """Reloads the table whenever the source file is replaced, e.g. by a new checkpoint."""
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                if os.stat(self.path).st_mtime_ns != self.mtime:
+                    self.load()
+                    print(f'Reloaded {self.path}')
+            except (OSError, ValueError, KeyError) as e:
+                print(f'Keeping the current policy, could not reload {self.path}: {e}')
+
+    def answer(self, line: bytes) -> bytes:
+        """Returns the response line to a request line."""
+        fields = line.split()
+        if not fields or len(fields) % 2:
+            return b'error: expected dealer_card player_sum pairs\n'
+
+        actions = self.actions
+        response = bytearray()
+        try:
+            for i in range(0, len(fields), 2):
+                d_first, p_sum = int(fields[i]), int(fields[i + 1])
+                response.append(actions[d_first * 22 + p_sum]
+                                if 1 <= d_first <= 10 and 1 <= p_sum <= 21 else 63) # '?'
+        except ValueError:
+            return b'error: expected integers\n'
+        response += b'\n'
+        return bytes(response)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves a connection, answering every complete request line that has arrived at once."""
+        pending = b''
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                *lines, pending = (pending + data).split(b'\n')
+                if lines:
+                    writer.write(b''.join([self.answer(line) for line in lines]))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str='127.0.0.1', port: int=2121, unix: str=None) -> asyncio.AbstractServer:
+        """Starts listening on a TCP port, or on a Unix socket if given, and watching the source file."""
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.watcher = asyncio.ensure_future(self.watch())
+        return server
+
+async def measure_latency(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                          num_requests: int=20000, window: int=32) -> np.ndarray:
+    """
+    Sends random single-pair requests, keeping up to window of them in flight, and
+    returns the latency of every request in seconds.
+    """
+    rng = np.random.default_rng(0)
+    requests = [f'{d} {p}\n'.encode() for d, p in zip(rng.integers(1, 11, num_requests),
+                                                        rng.integers(1, 22, num_requests))]
+    sent = np.zeros(num_requests)
+    latencies = np.zeros(num_requests)
+
+    async def receive():
+        for i in range(num_requests):
+            await reader.readline()
+            latencies[i] = time.perf_counter() - sent[i]
+
+    receiver = asyncio.ensure_future(receive())
+    for i, request in enumerate(requests):
+        # Wait for room in the window
+        while i - window >= 0 and latencies[i - window] == 0:
+            await asyncio.sleep(0)
+        sent[i] = time.perf_counter()
+        writer.write(request)
+    await writer.drain()
+    await receiver
+    return latencies
+
+
+async def serve(args):
+    server = PolicyServer(args.path, args.features, args.poll)
+    listener = await server.start(args.host, args.port, args.unix)
+    print(f'Serving {args.path} on {args.unix or f"{args.host}:{args.port}"}')
+    async with listener:
+        await listener.serve_forever()
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Serve the greedy policy of a trained agent.')
+
+    # Adding a positional argument
+    parser.add_argument('path',
+                        type=str,
+                        help='Path of a saved Q table or parameter vector (.npy), or a checkpoint (directory or .npz)')
+
+    parser.add_argument('--host',
+                        type=str,
+                        help='Host to listen on',
+                        default='127.0.0.1')
+
+    parser.add_argument('--port',
+                        type=int,
+                        help='TCP port to listen on',
+                        default=2121)
+
+    parser.add_argument('--unix',
+                        type=str,
+                        help='Path of a Unix socket to listen on instead of TCP',
+                        default=None)
+
+    parser.add_argument('--features',
+                        type=str,
+                        help='Feature engine of a parameter vector',
+                        default='coarse')
+
+    parser.add_argument('--poll',
+                        type=float,
+                        help='Seconds between checks for a new version of the file',
+                        default=1.0)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+    asyncio.run(serve(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# Standard
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+import hashlib
+import io
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+# External
+import numpy as np
+# Local
+
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Algorithm folder and search space of every learner: (scale, low, high) per parameter
+LEARNERS = {
+    'mc': {'folder': 'monte-carlo',
+           'space': {'N0': ('log', 1, 1000)}},
+    'td': {'folder': 'TD-learning',
+           'space': {'alpha': ('log', 1e-3, 0.3), 'lamda': ('linear', 0, 1),
+                     'gamma': ('linear', 0.9, 1), 'N0': ('log', 1, 1000)}},
+    'lfa': {'folder': 'lfa',
+            'space': {'alpha': ('log', 1e-3, 0.1), 'lamda': ('linear', 0, 1),
+                      'gamma': ('linear', 0.9, 1), 'e': ('log', 0.005, 0.3)}},
+}
+
+def use_folder(folder: str):
+    """Makes the modules of an algorithm folder, and the tournament, importable in a worker process."""
+    sys.path.insert(0, os.path.join(SRC_DIR, 'evaluation'))
+    sys.path.insert(0, os.path.join(SRC_DIR, folder))
+
+def sample_config(space: dict, rng: np.random.Generator) -> dict:
+    """Samples a configuration from a search space, uniformly or log-uniformly per parameter."""
+    config = {}
+    for name, (scale, low, high) in space.items():
+        if scale == 'log':
+            config[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+        else:
+            config[name] = float(rng.uniform(low, high))
+    return config
+
+def make_learner(learner: str, params: dict):
+    """Builds a learner with a configuration, in a worker process."""
+    if learner == 'mc':
+        from monte_carlo import MonteCarlo
+        return MonteCarlo(**params)
+    if learner == 'td':
+        from td_learning import SarlsaLamda
+        return SarlsaLamda(**params)
+    from lfa import LFA
+    return LFA(**params)
+
+def get_Q(learner: str, agent) -> np.ndarray:
+    """Returns the Q table (10, 21, 2) of a learner."""
+    return agent.FV.get_all_Q() if learner == 'lfa' else agent.Qs.avfs
+
+def reference_key(Q_ref: np.ndarray) -> str:
+    """Returns a short hash identifying a reference Q, or None without one."""
+    if Q_ref is None:
+        return None
+    Q_ref = np.ascontiguousarray(Q_ref, dtype=float)
+    return hashlib.sha1(str(Q_ref.shape).encode() + Q_ref.tobytes()).hexdigest()[:12]
+
+def run_trial(trial: dict) -> dict:
+    """
+    Trains a configuration up to its budget of episodes, in a worker process, and
+    scores its Q. A configuration promoted from the previous rung resumes from the
+    checkpoint it reached there.
+    """
+    from definitions import stream
+    from tournament import Hands, greedy_table, play
+
+    stream.seed(trial['seed'])
+    agent = make_learner(trial['learner'], trial['params'])
+    start_episode = 0
+    if trial['checkpoint'] is not None:
+        with np.load(io.BytesIO(trial['checkpoint'])) as data:
+            start_episode = agent.load_checkpoint({k: data[k] for k in data.files})
+
+    start_time = time.time()
+    with redirect_stdout(io.StringIO()):
+        agent.run(trial['budget'], num_iter=trial['budget'] + 1, plot=False, start_episode=start_episode)
+    duration = time.time() - start_time
+
+    # Lower is better: the MSE against the reference Q, or the negated mean return
+    Q = get_Q(trial['learner'], agent)
+    if trial['metric'] == 'mse':
+        loss = float(np.mean((Q - trial['Q_ref']) ** 2))
+    else:
+        hands = Hands(0, trial['eval_hands'], trial['eval_seed'])
+        loss = -float(np.mean(play(greedy_table(Q), hands)))
+
+    checkpoint = io.BytesIO()
+    np.savez(checkpoint, **agent.get_checkpoint(trial['budget']))
+    return {'config': trial['config'], 'rung': trial['rung'], 'loss': loss,
+            'duration': duration, 'checkpoint': checkpoint.getvalue()}
+
+class TrialStore():
+    """
+    The trials of a search, in a local SQLite file, so an interrupted search can
+    resume: every finished trial is committed at once, with the checkpoint its
+    configuration reached.
+    """
+    def __init__(self, path: str, settings: dict):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS search (settings TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS trials (
+                config INTEGER NOT NULL,
+                rung INTEGER NOT NULL,
+                budget INTEGER NOT NULL,
+                params TEXT NOT NULL,
+                seed INTEGER NOT NULL,
+                loss REAL NOT NULL,
+                duration REAL NOT NULL,
+                checkpoint BLOB NOT NULL,
+                PRIMARY KEY (config, rung));
+        """)
+
+        # A file only resumes the search it was created for
+        row = self.db.execute("SELECT settings FROM search").fetchone()
+        if row is None:
+            self.db.execute("INSERT INTO search VALUES (?)", (json.dumps(settings),))
+            self.db.commit()
+        elif json.loads(row[0]) != settings:
+            raise ValueError(f"{path} holds a search with other settings: {row[0]}")
+
+    def record(self, trial: dict, result: dict):
+        """Stores a finished trial."""
+        self.db.execute("INSERT INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (trial['config'], trial['rung'], trial['budget'], json.dumps(trial['params']),
+                         trial['seed'], result['loss'], result['duration'], result['checkpoint']))
+        self.db.commit()
+
+    def losses(self, rung: int) -> dict:
+        """Returns the loss of every configuration finished at a rung."""
+        return dict(self.db.execute("SELECT config, loss FROM trials WHERE rung = ?", (rung,)))
+
+    def checkpoint(self, config: int, rung: int) -> bytes:
+        """Returns the checkpoint a configuration reached at a rung, if any."""
+        row = self.db.execute("SELECT checkpoint FROM trials WHERE config = ? AND rung = ?",
+                              (config, rung)).fetchone()
+        return row[0] if row is not None else None
+
+    def close(self):
+        self.db.close()
+
+def successive_halving(path: str, learner: str='td', num_configs: int=27, min_budget: int=1000,
+                       eta: int=3, metric: str='mse', Q_ref: np.ndarray=None, eval_hands: int=100000,
+                       max_workers: int=None, seed: int=0) -> tuple:
+    """
+    Searches the hyperparameters of a learner with successive halving.
+
+    num_configs configurations are sampled and trained for min_budget episodes on a
+    process pool. The best 1/eta of them, by loss, are promoted to the next rung,
+    where they keep training up to eta times the budget, until one is left. Every
+    trial is stored in the SQLite file at path; running the same search again, with
+    the same reference Q, skips the trials already stored.
+
+    Returns the parameters and loss of the best configuration of the last rung.
+    """
+    settings = {'learner': learner, 'num_configs': num_configs, 'min_budget': min_budget, 'eta': eta,
+                'metric': metric, 'reference': reference_key(Q_ref), 'eval_hands': eval_hands, 'seed': seed}
+    store = TrialStore(path, settings)
+
+    # The same seed samples the same configurations, and gives each its own stream seed
+    rng = np.random.default_rng(seed)
+    configs = [sample_config(LEARNERS[learner]['space'], rng) for _ in range(num_configs)]
+    seeds = [int(ss.generate_state(1)[0]) for ss in np.random.SeedSequence(seed).spawn(num_configs)]
+
+    survivors = list(range(num_configs))
+    num_rungs = int(math.log(num_configs, eta) + 1e-9) + 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=use_folder,
+                             initargs=(LEARNERS[learner]['folder'],)) as executor:
+        for rung in range(num_rungs):
+            budget = min_budget * eta ** rung
+            finished = store.losses(rung)
+            trials = [{'learner': learner, 'config': c, 'rung': rung, 'budget': budget,
+                       'params': configs[c], 'seed': seeds[c], 'metric': metric, 'Q_ref': Q_ref,
+                       'eval_hands': eval_hands, 'eval_seed': seed,
+                       'checkpoint': store.checkpoint(c, rung - 1)}
+                      for c in survivors if c not in finished]
+
+            start_time = time.time()
+            futures = {executor.submit(run_trial, trial): trial for trial in trials}
+            for future in as_completed(futures):
+                store.record(futures[future], future.result())
+            print(f'Rung {rung}: {len(survivors)} configurations, {budget} episodes each '
+                  f'({len(trials)} trained in {time.time() - start_time:.2f} sec)')
+
+            # Promote the best configurations
+            losses = store.losses(rung)
+            survivors = sorted(survivors, key=lambda c: losses[c])
+            for c in survivors[:3]:
+                print(f'\tloss {losses[c]:.5f}: {configs[c]}')
+            survivors = survivors[:max(1, len(survivors) // eta)]
+
+    store.close()
+    return configs[survivors[0]], losses[survivors[0]]
+
+
+def main():
+    # Initialize the parser
+    parser = argparse.ArgumentParser(description='Search the hyperparameters of a learner with successive halving.')
+
+    # Adding a positional argument
+    parser.add_argument('learner',
+                        type=str,
+                        choices=list(LEARNERS),
+                        help='Learner to tune')
+
+    parser.add_argument('--configs',
+                        type=int,
+                        help='Number of configurations sampled',
+                        default=27)
+
+    parser.add_argument('--min-budget',
+                        type=int,
+                        help='Episodes per configuration at the first rung',
+                        default=1000)
+
+    parser.add_argument('--eta',
+                        type=int,
+                        help='Budget growth, and inverse of the fraction promoted, per rung',
+                        default=3)
+
+    parser.add_argument('--metric',
+                        type=str,
+                        choices=['mse', 'return'],
+                        help='Score by the MSE against the reference Q, or by the mean return of the greedy policy',
+                        default='mse')
+
+    parser.add_argument('--reference',
+                        type=str,
+                        help='Path of a reference Q (.npy) for the MSE',
+                        default=None)
+
+    parser.add_argument('--eval-hands',
+                        type=int,
+                        help='Number of common hands the greedy policies are evaluated on',
+                        default=100000)
+
+    parser.add_argument('--workers',
+                        type=int,
+                        help='Number of worker processes (default: one per core)',
+                        default=None)
+
+    parser.add_argument('--seed',
+                        type=int,
+                        help='Seed of the configurations, runs and evaluation hands',
+                        default=0)
+
+    parser.add_argument('--db',
+                        type=str,
+                        help='Path of the SQLite file of the trials (default: results/search-<learner>.sqlite)',
+                        default=None)
+
+    # Parsing the arguments
+    args = parser.parse_args()
+    if args.metric == 'mse' and args.reference is None:
+        parser.error('--metric mse needs a --reference Q')
+    Q_ref = np.load(args.reference) if args.reference else None
+
+    path = args.db or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"search-{args.learner}.sqlite")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    start_time = time.time()
+    params, loss = successive_halving(path, args.learner, args.configs, args.min_budget, args.eta,
+                                      args.metric, Q_ref, args.eval_hands, args.workers, args.seed)
+    print(f'Searched in {time.time() - start_time:.2f} sec')
+    print(f'Best configuration (loss {loss:.5f}): {params}')
+
+if __name__ == "__main__":
+    main()